@@ -5,6 +5,9 @@ import { datastore } from './datastore.js';
 // State
 let currentIndex = 0;
 let profiles = [];
+let nextCursor = null;
+let hasMoreProfiles = true;
+let isLoadingProfiles = false;
 const stackContainer = document.getElementById('stack-container');
 const endCard = document.getElementById('end-card');
 const matchModal = document.getElementById('match-modal');
@@ -14,6 +17,7 @@ let userLocation = null;
 
 // Config
 const THRESHOLD = 100; // px to trigger swipe
+const PREFETCH_REMAINING = 3; // fetch the next page when this few cards are left
 
 async function init() {
     getUserLocation();
@@ -24,27 +28,37 @@ async function init() {
         if (myProfile) {
             const avatarParams = document.getElementById('user-avatar');
             const nameDisplay = document.getElementById('user-display');
-            if (avatarParams) avatarParams.src = myProfile.image || `https://ui-avatars.com/api/?name=${myProfile.name}`;
+            if (avatarParams) avatarParams.src = myProfile.image_thumb || myProfile.image || `https://ui-avatars.com/api/?name=${myProfile.name}`;
             if (nameDisplay) nameDisplay.textContent = myProfile.name;
         }
     } catch (e) {
         console.error("Failed to load my profile", e);
     }
 
-    // Fetch profiles from API
+    // Fetch first page of profiles from API
+    await loadMoreProfiles();
+
+    renderStack();
+    setupControls();
+}
+
+async function loadMoreProfiles() {
+    if (isLoadingProfiles || !hasMoreProfiles) return;
+    isLoadingProfiles = true;
     try {
-        const rawProfiles = await datastore.getProfiles();
+        const page = await datastore.getProfiles(nextCursor);
         // Normalize API data (flat location) to App data (nested location)
-        profiles = rawProfiles.map(p => ({
+        profiles = profiles.concat(page.profiles.map(p => ({
             ...p,
             location: { lat: p.location_lat, lng: p.location_lng }
-        }));
+        })));
+        nextCursor = page.nextCursor;
+        hasMoreProfiles = !!nextCursor;
     } catch (e) {
         console.error("Failed to load profiles", e);
+    } finally {
+        isLoadingProfiles = false;
     }
-
-    renderStack();
-    setupControls();
 }
 
 function getUserLocation() {
@@ -152,7 +166,7 @@ function createCard(profile) {
         <div class="stamp stamp-nope transform rotate-12 border-4 border-github-red text-github-red rounded px-2 font-bold text-2xl absolute top-8 right-8 z-20 opacity-0 pointer-events-none">CLOSE</div>
         
         <div class="h-3/5 w-full relative">
-            <img src="${profile.image}" class="w-full h-full object-cover pointer-events-none" alt="${profile.name}">
+            <img src="${profile.image_card || profile.image}" class="w-full h-full object-cover pointer-events-none" alt="${profile.name}">
             <div class="absolute inset-0 bg-gradient-to-t from-github-card to-transparent"></div>
             
             <!-- Match Badge -->
@@ -285,6 +299,16 @@ function dismissCard(card, direction) {
         currentIndex++;
         renderStack();
 
+        if (profiles.length - currentIndex <= PREFETCH_REMAINING) {
+            loadMoreProfiles().then(() => {
+                // Only re-render if we were showing the end card
+                if (currentIndex < profiles.length && !endCard.classList.contains('hidden')) {
+                    endCard.classList.add('hidden');
+                    renderStack();
+                }
+            });
+        }
+
         // Save Action & Check Match via API
         datastore.saveLike(profile.id, direction === 'right' ? 'like' : 'pass')
             .then(res => {
@@ -0,0 +1,182 @@
+import gzip
+import mimetypes
+import os
+import re
+from typing import Iterable, Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.staticfiles import NotModifiedResponse
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+
+try:
+    import brotli
+except ImportError: # Optional: without it only .gz copies are generated
+    brotli = None
+
+# Static serving: only allowlisted file types are served (never .db, .py or
+# dotfiles), with long-lived caching for content-hashed names and
+# precompressed .br/.gz copies when the client accepts them. ETag,
+# If-None-Match and Range come from Starlette's FileResponse.
+#
+# Precompressed copies live under ASSET_CACHE_DIR, mirroring the source path
+# relative to the working directory, never next to the sources. If it isn't
+# writable (read-only deploys) precompression is skipped and assets are
+# served as they are, compressed on the fly by CompressionMiddleware.
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", ".asset_cache")
+
+FRONTEND_SUFFIXES = {".html", ".js", ".css", ".json", ".ico", ".png", ".svg", ".webmanifest"}
+STATIC_SUFFIXES = {".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".ico"}
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".css", ".json", ".svg", ".webmanifest"}
+COMPRESS_MIN_BYTES = 1024
+
+# e.g. uploads/<sha256>.png, uploads/<sha256>_thumb.webp, app.3f9a0c1d2e4b5a6c.js
+HASHED_NAME = re.compile(r"(^|[._-])[0-9a-f]{16,}[._-]")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache" # Cache, but check the ETag before every reuse
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def cache_path(path: str, ext: str) -> Optional[str]:
+    rel = os.path.relpath(os.path.abspath(path))
+    if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+        return None # Outside the working directory: never precompressed
+    return os.path.join(ASSET_CACHE_DIR, rel + ext)
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles restricted to an allowlist of file types.
+
+    With `recursive=False` only files directly in `directory` are served,
+    so a mount of the project root can't reach into subdirectories.
+    """
+
+    def __init__(self, *, directory: str, suffixes: Iterable[str], recursive: bool = True, html: bool = False):
+        super().__init__(directory=directory, html=html)
+        self.suffixes = set(suffixes)
+        self.recursive = recursive
+
+    def allowed(self, path: str) -> bool:
+        parts = os.path.normpath(path).split(os.sep)
+        if any(part.startswith(".") for part in parts):
+            return False
+        if not self.recursive and len(parts) > 1:
+            return False
+        return os.path.splitext(parts[-1])[1].lower() in self.suffixes
+
+    def lookup_path(self, path: str) -> Tuple[str, Optional[os.stat_result]]:
+        if os.path.normpath(path) == ".":
+            return super().lookup_path(path) # Directory itself, for html=True index lookup
+        if not self.allowed(path):
+            return "", None
+        return super().lookup_path(path)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        suffix = os.path.splitext(full_path)[1].lower()
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+
+        path, encoding = full_path, None
+        if status_code == 200 and suffix in COMPRESSIBLE_SUFFIXES and "range" not in request_headers:
+            # Byte ranges are only served from the identity encoding
+            path, stat_result, encoding = self._precompressed(full_path, stat_result, request_headers)
+
+        response = FileResponse(path, status_code=status_code, stat_result=stat_result, media_type=media_type)
+        hashed = HASHED_NAME.search(os.path.basename(full_path)) is not None
+        response.headers["cache-control"] = IMMUTABLE if hashed else REVALIDATE
+        if suffix in COMPRESSIBLE_SUFFIXES:
+            response.headers["vary"] = "Accept-Encoding"
+        if encoding is not None:
+            response.headers["content-encoding"] = encoding
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _precompressed(self, full_path: str, stat_result: os.stat_result, request_headers: Headers):
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, ext in ENCODINGS:
+            cached = cache_path(full_path, ext)
+            if encoding not in accepted or cached is None:
+                continue
+            try:
+                cached_stat = os.stat(cached)
+            except OSError:
+                continue
+            if cached_stat.st_mtime >= stat_result.st_mtime: # Older copies are stale
+                return cached, cached_stat, encoding
+        return full_path, stat_result, None
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part = f"{path}.{os.getpid()}.part"
+    with open(part, "wb") as f:
+        f.write(data)
+    os.replace(part, path)
+
+
+def precompress(directory: str, recursive: bool = True, skip: Iterable[str] = ()) -> int:
+    """Write .gz (and .br with brotli installed) copies of compressible assets.
+
+    Copies newer than their source are left alone; returns the number written.
+    Stops at the first write error (e.g. a read-only cache directory).
+    """
+    written = 0
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in skip] if recursive else []
+        for name in files:
+            if name.startswith(".") or os.path.splitext(name)[1].lower() not in COMPRESSIBLE_SUFFIXES:
+                continue
+            path = os.path.join(root, name)
+            stat_result = os.stat(path)
+            if stat_result.st_size < COMPRESS_MIN_BYTES:
+                continue
+            data = None
+            for encoding, ext in ENCODINGS:
+                cached = cache_path(path, ext)
+                if cached is None or (encoding == "br" and brotli is None):
+                    continue
+                try:
+                    if os.stat(cached).st_mtime >= stat_result.st_mtime:
+                        continue
+                except OSError:
+                    pass
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                if encoding == "br":
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                try:
+                    _write(cached, compressed)
+                except OSError as e:
+                    print(f"Assets: can't write to {ASSET_CACHE_DIR} ({e}); serving uncompressed files")
+                    return written
+                written += 1
+    return written
+
+
+def precompress_all() -> int:
+    written = precompress(".", recursive=False) + precompress("static", skip={"uploads"}) # Images don't compress
+    if written:
+        print(f"Assets: precompressed {written} file(s)")
+    return written
+
+
+if __name__ == "__main__":
+    # Build step: python assets.py (also run at startup)
+    precompress_all()
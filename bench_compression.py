@@ -0,0 +1,90 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Payload size and compression CPU cost for the big JSON endpoints, per
+# codec/level, plus end-to-end request time with and without compression.
+# Runs against a throwaway SQLite database, so set DATABASE_URL before main loads.
+# Usage: python bench_compression.py [n_users] [requests]
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from fastapi.testclient import TestClient
+
+import compression
+import main
+import models
+from database import SessionLocal
+
+TAGS = ["Python", "Go", "Rust", "TypeScript", "React", "Postgres", "Docker", "Kubernetes", "AWS", "Linux"]
+PHOTOS = ["1494790108377-be9c29b29330", "1500648767791-00dcc994a43e", "1573496359142-b8d87734a5a2",
+          "1507003211169-0a1dd7228f2d", "1438761681033-6461ffad8d80", "1472099645785-5658abf4ff4e"]
+
+ENDPOINTS = [
+    ("profiles", "/api/profiles?limit=100"),
+    ("nearby", "/api/nearby?lat=40.7&lng=-74.0&limit=200"),
+    ("likes/sent", "/api/likes/sent"),
+    ("debug", "/api/debug"),
+]
+
+def populate(n):
+    rng = random.Random(5)
+    db = SessionLocal()
+    db.bulk_insert_mappings(models.User, [{
+        "id": i, "name": f"User {i}", "role": rng.choice(["Frontend Architect", "Systems Engineer", "AI Researcher"]),
+        "bio": "Rust enthusiast. I promise not to rewrite your codebase.", "stack": rng.sample(TAGS, 5),
+        "image": f"https://images.unsplash.com/photo-{rng.choice(PHOTOS)}?auto=format&fit=crop&w=500&q=80",
+        "location_lat": 40.7 + rng.uniform(-0.2, 0.2), "location_lng": -74.0 + rng.uniform(-0.2, 0.2),
+        "email": f"user{i}@example.com", "password": "secret", "username": f"user{i}",
+    } for i in range(1, n + 1)])
+    db.bulk_insert_mappings(models.Action, [
+        {"user_id": 1, "target_id": t, "action_type": "like", "timestamp": models.utcnow()}
+        for t in range(2, min(n, 300) + 1)
+    ])
+    db.commit()
+    db.close()
+
+def codecs():
+    yield "gzip-1", "gzip", {"gzip_level": 1}
+    yield "gzip-6", "gzip", {"gzip_level": 6}
+    yield "gzip-9", "gzip", {"gzip_level": 9}
+    if compression.brotli is not None:
+        for quality in (1, 4, 11):
+            yield f"br-{quality}", "br", {"brotli_quality": quality}
+
+def cost_ms(body, encoding, options, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        out = compression.compress(body, encoding, **options)
+    return len(out), (time.perf_counter() - start) / requests * 1000
+
+def timed(client, path, headers, requests):
+    client.get(path, headers=headers) # Warm up
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=headers)
+    return (time.perf_counter() - start) / requests * 1000
+
+def run(n_users, requests):
+    populate(n_users)
+    client = TestClient(main.app)
+    user = {"X-User-Id": "1"}
+    bodies = [(name, path, client.get(path, headers={**user, "Accept-Encoding": "identity"}).content)
+              for name, path in ENDPOINTS]
+
+    print(f"users={n_users} requests={requests} brotli={'yes' if compression.brotli is not None else 'no'}")
+    for name, path, body in bodies:
+        print(f"  {name}: {len(body) / 1024:.1f} KB raw")
+        for label, encoding, options in codecs():
+            size, ms = cost_ms(body, encoding, options, requests)
+            print(f"    {label:7s} {size / 1024:7.1f} KB  ({len(body) / size:4.1f}x)  {ms:6.2f} ms")
+        plain_ms = timed(client, path, {**user, "Accept-Encoding": "identity"}, requests)
+        gzip_ms = timed(client, path, {**user, "Accept-Encoding": "gzip"}, requests)
+        print(f"    request: identity {plain_ms:.2f} ms  gzip-{compression.COMPRESS_GZIP_LEVEL} {gzip_ms:.2f} ms")
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    run(n_users, requests)
@@ -0,0 +1,95 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+import migrations
+
+# Query plans and timings of the hot queries before and after the composite
+# index migration, on a throwaway SQLite database with the legacy schema.
+# Usage: python bench_indexes.py [n_users] [actions_per_user]
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, name VARCHAR, role VARCHAR, bio VARCHAR, "
+    "stack JSON, image VARCHAR, location_lat FLOAT, location_lng FLOAT, email VARCHAR, password VARCHAR)",
+    "CREATE TABLE actions (id INTEGER PRIMARY KEY, user_id INTEGER, target_id INTEGER, action_type VARCHAR, timestamp VARCHAR)",
+    "CREATE TABLE matches (id INTEGER PRIMARY KEY, user1_id INTEGER, user2_id INTEGER, timestamp VARCHAR)",
+    "CREATE TABLE messages (id INTEGER PRIMARY KEY, match_id INTEGER, sender_id INTEGER, content VARCHAR, "
+    "timestamp VARCHAR, is_read BOOLEAN)",
+]
+
+QUERIES = {
+    "my actions": "SELECT target_id FROM actions WHERE user_id = :me",
+    "reverse like": "SELECT id FROM actions WHERE user_id = :other AND target_id = :me AND action_type = 'like'",
+    "likes received": "SELECT user_id FROM actions WHERE target_id = :me AND action_type = 'like'",
+    "match pair": "SELECT id FROM matches WHERE user1_id = :me AND user2_id = :other",
+    "my matches": "SELECT id FROM matches WHERE user1_id = :me OR user2_id = :me",
+    "unread count":
+        "SELECT count(*) FROM messages WHERE sender_id != :me AND is_read = 0 AND match_id IN "
+        "(SELECT id FROM matches WHERE user1_id = :me OR user2_id = :me)",
+}
+
+def populate(conn, n_users, actions_per_user):
+    rng = random.Random(7)
+    conn.execute(text("INSERT INTO users (id, name, email) VALUES (:id, :name, :email)"),
+                 [{"id": i, "name": f"user{i}", "email": f"user{i}@test.com"} for i in range(1, n_users + 1)])
+
+    actions = []
+    for user_id in range(1, n_users + 1):
+        for target_id in rng.sample(range(1, n_users + 1), actions_per_user):
+            kind = "like" if rng.random() < 0.3 else "pass"
+            actions.append({"u": user_id, "t": target_id, "k": kind})
+    conn.execute(text("INSERT INTO actions (user_id, target_id, action_type, timestamp) VALUES (:u, :t, :k, '')"), actions)
+
+    # Roughly two matches per user
+    pairs = set()
+    while len(pairs) < n_users:
+        a, b = rng.sample(range(1, n_users + 1), 2)
+        pairs.add((min(a, b), max(a, b)))
+    pairs = sorted(pairs)
+    conn.execute(text("INSERT INTO matches (user1_id, user2_id, timestamp) VALUES (:a, :b, '')"),
+                 [{"a": a, "b": b} for a, b in pairs])
+    messages = []
+    for match_id in range(1, len(pairs) + 1):
+        a, b = pairs[match_id - 1]
+        for i in range(20):
+            messages.append({"m": match_id, "s": a if i % 2 else b, "r": rng.random() < 0.8})
+    conn.execute(text("INSERT INTO messages (match_id, sender_id, content, timestamp, is_read) VALUES (:m, :s, 'hi', '', :r)"),
+                 messages)
+    return pairs
+
+def report(engine, params, repeats=50):
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            plan = " / ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql), params))
+            start = time.perf_counter()
+            for _ in range(repeats):
+                conn.execute(text(sql), params).fetchall()
+            ms = (time.perf_counter() - start) / repeats * 1000
+            print(f"  {name:15s} {ms:8.3f} ms  {plan}")
+
+def run(n_users, actions_per_user):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for ddl in LEGACY_SCHEMA:
+            conn.execute(text(ddl))
+        pairs = populate(conn, n_users, actions_per_user)
+
+    me, other = pairs[len(pairs) // 2] if pairs else (1, 2)
+    params = {"me": me, "other": other}
+    print(f"users={n_users} actions={n_users * actions_per_user} matches={len(pairs)}")
+    print("before:")
+    report(engine, params)
+    migrations.upgrade(engine)
+    print("after:")
+    report(engine, params)
+    os.remove(path)
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    actions_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    run(n_users, actions_per_user)
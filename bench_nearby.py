@@ -0,0 +1,69 @@
+import math
+import random
+import sys
+import time
+
+import distance
+from distance import PointArrays, nearest_k
+from geo import GridIndex
+
+# Micro-benchmark: legacy per-user haversine loop vs. the vectorized kernel
+# vs. the spatial grid. Usage: python bench_nearby.py [n_users] [repeats]
+
+CENTER = (40.7128, -74.0060) # NYC
+
+def legacy_loop(lat, lng, users):
+    # Same math as the original get_nearby, minus the ORM/pydantic work
+    results = []
+    for user_id, u_lat, u_lng in users:
+        R = 6371
+        dLat = (u_lat - lat) * (math.pi / 180)
+        dLon = (u_lng - lng) * (math.pi / 180)
+        a = math.sin(dLat/2) * math.sin(dLat/2) + \
+            math.cos(lat * (math.pi/180)) * math.cos(u_lat * (math.pi/180)) * \
+            math.sin(dLon/2) * math.sin(dLon/2)
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+        results.append((R * c, user_id))
+    return sorted(results)
+
+def make_users(n):
+    rng = random.Random(42)
+    users = []
+    for user_id in range(1, n + 1):
+        # 80% clustered around the metro area, 20% spread worldwide
+        if rng.random() < 0.8:
+            lat, lng = rng.gauss(CENTER[0], 0.2), rng.gauss(CENTER[1], 0.2)
+        else:
+            lat, lng = rng.uniform(-80, 80), rng.uniform(-180, 180)
+        users.append((user_id, lat, lng))
+    return users
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+def run(n, repeats, k=50):
+    users = make_users(n)
+    points = PointArrays.from_points(users)
+    grid = GridIndex()
+    for user_id, lat, lng in users:
+        grid.update(user_id, lat, lng)
+    lat, lng = CENTER
+
+    expected = [uid for _, uid in legacy_loop(lat, lng, users)[:k]]
+    assert [uid for _, uid in nearest_k(lat, lng, points, k)] == expected
+    assert [uid for _, uid in grid.nearest(lat, lng, k)] == expected
+
+    kernel = "numpy" if distance.np is not None else "pure-python"
+    print(f"n={n} k={k} kernel={kernel}")
+    print(f"  legacy loop + sort : {timed(lambda: legacy_loop(lat, lng, users)[:k], repeats):8.2f} ms")
+    print(f"  nearest_k full scan: {timed(lambda: nearest_k(lat, lng, points, k), repeats):8.2f} ms")
+    print(f"  grid nearest       : {timed(lambda: grid.nearest(lat, lng, k), repeats):8.2f} ms")
+    print(f"  grid radius 5 km   : {timed(lambda: grid.nearest(lat, lng, k, radius_km=5), repeats):8.2f} ms")
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    run(n_users, repeats)
@@ -0,0 +1,74 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Profile-list serialization: ORM entities + UserRead.from_orm().dict() +
+# response_model validation (the old path) vs. public_profiles + FastJSONResponse.
+# Runs against a throwaway SQLite database, so set DATABASE_URL before main loads.
+# Usage: python bench_serialization.py [n_users] [requests]
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from typing import List
+
+from fastapi import Depends, FastAPI, Query
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import fastjson
+import main
+import models
+import profiles
+from database import SessionLocal, get_db
+
+TAGS = ["Python", "Go", "Rust", "TypeScript", "React", "Postgres", "Docker", "Kubernetes", "AWS", "Linux"]
+
+def populate(n):
+    rng = random.Random(3)
+    db = SessionLocal()
+    db.bulk_insert_mappings(models.User, [{
+        "id": i, "name": f"User {i}", "role": "Engineer", "bio": "Ships on Fridays. " * 3,
+        "stack": rng.sample(TAGS, 5), "image": f"https://example.com/{i}.jpg",
+        "location_lat": 40 + rng.random(), "location_lng": -74 + rng.random(),
+        "email": f"user{i}@example.com", "password": "secret", "username": f"user{i}",
+    } for i in range(1, n + 1)])
+    db.commit()
+    db.close()
+
+bench = FastAPI()
+
+@bench.get("/legacy", response_model=List[main.UserRead])
+def legacy(limit: int = Query(...), db: Session = Depends(get_db)):
+    users = db.query(models.User).filter(models.User.id <= limit).all()
+    return [main.UserRead.from_orm(u).dict() for u in users]
+
+@bench.get("/fast", response_model=List[main.UserRead])
+def fast(limit: int = Query(...), db: Session = Depends(get_db)):
+    users = profiles.public_profiles(db, range(1, limit + 1))
+    return fastjson.FastJSONResponse([p.to_dict() for p in users.values()])
+
+def timed(client, path, requests):
+    client.get(path) # Warm up
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    return (time.perf_counter() - start) / requests * 1000
+
+def run(n_users, requests):
+    populate(n_users)
+    client = TestClient(bench)
+    encoder = "orjson" if fastjson.orjson is not None else "json"
+    print(f"users={n_users} requests={requests} encoder={encoder}")
+    for limit in (20, 100, 200):
+        limit = min(limit, n_users)
+        assert client.get(f"/legacy?limit={limit}").json() == client.get(f"/fast?limit={limit}").json()
+        legacy_ms = timed(client, f"/legacy?limit={limit}", requests)
+        fast_ms = timed(client, f"/fast?limit={limit}", requests)
+        print(f"  {limit:4d} profiles: legacy {legacy_ms:7.2f} ms  fast {fast_ms:7.2f} ms  ({legacy_ms / fast_ms:4.1f}x)")
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    run(n_users, requests)
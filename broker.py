@@ -0,0 +1,133 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List
+
+# Pub/sub backend behind ConnectionManager (and anything else that needs to
+# reach every worker). Events are (kind, payload) pairs; each process
+# subscribes handlers per kind and acts only on what it holds locally.
+#
+#   WS_BROKER=memory  in-process delivery (default, single worker)
+#   WS_BROKER=sqlite  cross-process fan-out through a shared SQLite file
+#                     (WS_BROKER_PATH), for uvicorn --workers N on one host
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class InProcessBroker:
+    def __init__(self):
+        self.handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self.loop = None
+
+    def subscribe(self, kind: str, handler: Handler):
+        self.handlers[kind].append(handler)
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        pass
+
+    async def publish(self, kind: str, payload: dict):
+        await self._dispatch(kind, payload)
+
+    def publish_threadsafe(self, kind: str, payload: dict):
+        """Publish from sync code running in the threadpool."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.publish(kind, payload), self.loop)
+
+    async def _dispatch(self, kind: str, payload: dict):
+        for handler in self.handlers.get(kind, ()):
+            try:
+                await handler(payload)
+            except Exception as e:
+                print(f"Broker: handler for {kind} failed: {e}")
+
+
+class SQLiteBroker(InProcessBroker):
+    """Append-only event table in a SQLite file shared by all workers.
+
+    Publishers insert a row; every worker tails the table from the id it saw
+    at startup and dispatches new rows to its local handlers. Rows older than
+    `retention` seconds are pruned.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05, retention: float = 60):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.last_id = 0
+        self._task = None
+        self._conn = None
+        self._lock = threading.Lock() # One connection, used from worker threads
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            return self._conn.execute(sql, params).fetchall()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ws_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        return conn
+
+    async def start(self):
+        await super().start()
+        rows = await asyncio.to_thread(self._execute, "SELECT MAX(id) FROM ws_events")
+        self.last_id = rows[0][0] or 0
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    async def publish(self, kind: str, payload: dict):
+        row = (kind, json.dumps(payload), time.time())
+        await asyncio.to_thread(self._execute, "INSERT INTO ws_events (kind, payload, created) VALUES (?, ?, ?)", row)
+
+    def _fetch(self):
+        return self._execute("SELECT id, kind, payload FROM ws_events WHERE id > ? ORDER BY id", (self.last_id,))
+
+    def _prune(self):
+        self._execute("DELETE FROM ws_events WHERE created < ?", (time.time() - self.retention,))
+
+    async def _poll(self):
+        last_prune = time.monotonic()
+        while True:
+            try:
+                for event_id, kind, payload in await asyncio.to_thread(self._fetch):
+                    self.last_id = event_id
+                    await self._dispatch(kind, json.loads(payload))
+                if time.monotonic() - last_prune > self.retention:
+                    await asyncio.to_thread(self._prune)
+                    last_prune = time.monotonic()
+            except sqlite3.Error as e:
+                print(f"Broker: poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+def create_broker() -> InProcessBroker:
+    backend = os.getenv("WS_BROKER", "memory")
+    if backend == "sqlite":
+        return SQLiteBroker(os.getenv("WS_BROKER_PATH", "./ws_broker.db"))
+    return InProcessBroker()
@@ -0,0 +1,176 @@
+from typing import Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from database import AsyncSessionLocal
+from notifications import bump_unread, decrement_unread, unread_versions
+
+MAX_MESSAGE_LENGTH = 4000
+MAX_CLIENT_ID_LENGTH = 64
+
+
+# --- Shared by the HTTP and WebSocket chat paths (async sessions) ---
+
+async def find_match(db: AsyncSession, user_a: int, user_b: int) -> Optional[models.Match]:
+    return await db.scalar(select(models.Match).where(models.match_pair(user_a, user_b)))
+
+
+def client_message_id(value) -> Optional[str]:
+    # Anything that isn't a short string is ignored rather than rejected
+    if isinstance(value, str) and 0 < len(value) <= MAX_CLIENT_ID_LENGTH:
+        return value
+    return None
+
+
+async def _find_by_client_id(db: AsyncSession, sender_id: int, client_id: str) -> Optional[models.Message]:
+    return await db.scalar(select(models.Message).where(
+        models.Message.sender_id == sender_id, models.Message.client_id == client_id))
+
+
+async def save_message(db: AsyncSession, match_id: int, sender_id: int, recipient_id: int, text: str,
+                       client_id: Optional[str] = None) -> Tuple[models.Message, bool]:
+    """Store a message; returns (message, created).
+
+    A `client_id` the sender already used returns the stored message with
+    created=False, so a resend after a lost ack (socket, then HTTP) is a no-op.
+    """
+    if client_id is not None:
+        existing = await _find_by_client_id(db, sender_id, client_id)
+        if existing is not None:
+            return existing, False
+    db_msg = models.Message(
+        match_id=match_id,
+        sender_id=sender_id,
+        content=text,
+        timestamp=models.utcnow(),
+        is_read=False,
+        client_id=client_id
+    )
+    db.add(db_msg)
+    try:
+        await bump_unread(db, recipient_id, match_id) # Autoflushes the insert
+        await db.commit()
+    except IntegrityError:
+        # The same send raced in through the other path; keep the first one
+        await db.rollback()
+        existing = await _find_by_client_id(db, sender_id, client_id) if client_id is not None else None
+        if existing is None:
+            raise
+        return existing, False
+    unread_versions.bump(recipient_id)
+    return db_msg, True
+
+
+async def mark_read(db: AsyncSession, match_id: int, reader_id: int) -> int:
+    """Mark the partner's messages in a match as read; returns how many changed."""
+    # One set-based UPDATE for the whole match
+    result = await db.execute(
+        update(models.Message).where(
+            models.Message.match_id == match_id,
+            models.Message.sender_id != reader_id,
+            models.Message.is_read == False
+        ).values(is_read=True)
+    )
+    marked = result.rowcount
+    counter_reset = await decrement_unread(db, reader_id, match_id, marked)
+    await db.commit()
+    if counter_reset:
+        unread_versions.bump(reader_id)
+    return marked
+
+
+def new_message_event(msg: models.Message) -> dict:
+    return {
+        "type": "new_message",
+        "id": msg.id,
+        "sender_id": msg.sender_id,
+        "text": msg.content,
+        "timestamp": models.isoformat_utc(msg.timestamp)
+    }
+
+
+def read_receipt_event(reader_id: int) -> dict:
+    return {
+        "type": "read_receipt",
+        "reader_id": reader_id,
+        "timestamp": models.isoformat_utc(models.utcnow())
+    }
+
+
+# --- WebSocket chat protocol ---
+
+class ChatProtocol:
+    """Chat frames sent by clients on /ws/{user_id}.
+
+        {"type": "send", "client_id": "c1", "partner_id": 5, "text": "hi"}
+            -> {"type": "ack", "client_id": "c1", "id": 42, "timestamp": ...} to the sender
+            -> {"type": "new_message", "id": 42, ...} to the partner
+        {"type": "delivered", "partner_id": 1, "message_ids": [42]}
+            -> {"type": "delivered", "by": 5, "message_ids": [42]} to the partner
+        {"type": "read", "partner_id": 1}
+            -> {"type": "read_receipt", ...} to the partner if anything was unread
+
+    Match membership is cached per connection, so an active conversation only
+    touches the database for the insert itself.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    async def handle(self, conn, frame: dict):
+        kind = frame.get("type")
+        if kind == "pong":
+            return
+        if kind not in ("send", "delivered", "read"):
+            conn.enqueue({"type": "error", "detail": "Unknown frame type"})
+            return
+
+        partner_id = frame.get("partner_id")
+        match_id = await self._match_for(conn, partner_id)
+        if match_id is None:
+            conn.enqueue({"type": "error", "client_id": frame.get("client_id"), "detail": "Match not found"})
+            return
+
+        if kind == "send":
+            await self._send(conn, frame, partner_id, match_id)
+        elif kind == "delivered":
+            message_ids = frame.get("message_ids")
+            if not isinstance(message_ids, list):
+                conn.enqueue({"type": "error", "detail": "message_ids must be a list"})
+                return
+            message_ids = [i for i in message_ids if isinstance(i, int) and not isinstance(i, bool)]
+            if message_ids:
+                await self.manager.send_personal_message(
+                    {"type": "delivered", "by": conn.user_id, "message_ids": message_ids}, partner_id)
+        else:
+            async with AsyncSessionLocal() as db:
+                marked = await mark_read(db, match_id, conn.user_id)
+            if marked:
+                await self.manager.send_personal_message(read_receipt_event(conn.user_id), partner_id)
+
+    async def _match_for(self, conn, partner_id) -> Optional[int]:
+        if not isinstance(partner_id, int):
+            return None
+        match_id = conn.matches.get(partner_id)
+        if match_id is None:
+            async with AsyncSessionLocal() as db:
+                match_id = await db.scalar(select(models.Match.id).where(models.match_pair(conn.user_id, partner_id)))
+            if match_id is not None:
+                conn.matches[partner_id] = match_id # Matches are never removed
+        return match_id
+
+    async def _send(self, conn, frame: dict, partner_id: int, match_id: int):
+        text = frame.get("text")
+        if not isinstance(text, str) or not text.strip() or len(text) > MAX_MESSAGE_LENGTH:
+            conn.enqueue({"type": "error", "client_id": frame.get("client_id"), "detail": "Invalid message text"})
+            return
+        async with AsyncSessionLocal() as db:
+            msg, created = await save_message(db, match_id, conn.user_id, partner_id, text,
+                                              client_message_id(frame.get("client_id")))
+            event = new_message_event(msg)
+        conn.enqueue({"type": "ack", "client_id": frame.get("client_id"), "id": event["id"], "timestamp": event["timestamp"]})
+        if created:
+            await self.manager.send_personal_message(event, partner_id)
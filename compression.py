@@ -0,0 +1,109 @@
+import gzip
+import os
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError: # Optional: without it only gzip is offered
+    brotli = None
+
+# Response compression for API payloads. Only complete single-message bodies
+# are compressed, which includes small FileResponses sent in one chunk; larger
+# streamed files, byte ranges and anything that already carries a
+# Content-Encoding (precompressed assets) pass through. A strong ETag on a
+# compressed body is weakened, since the bytes no longer match the original.
+# Defaults picked with bench_compression.py.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+COMPRESS_TYPES = (
+    "application/json", "text/html", "text/css", "text/javascript",
+    "application/javascript", "text/plain", "image/svg+xml",
+)
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = COMPRESS_GZIP_LEVEL,
+             brotli_quality: int = COMPRESS_BROTLI_QUALITY) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """Brotli/gzip for responses over `minimum_size` with an allowlisted type.
+
+    WebSocket scopes are passed straight through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_BYTES, gzip_level: int = COMPRESS_GZIP_LEVEL,
+                 brotli_quality: int = COMPRESS_BROTLI_QUALITY, content_types: Iterable[str] = COMPRESS_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.content_types = tuple(content_types)
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        accepted = accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = ("content-encoding" in headers or "content-range" in headers
+                               or not content_type.startswith(self.content_types))
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message # Held back until the body decides the headers
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            passthrough = True # Only the first body message is considered
+            if message["type"] != "http.response.body":
+                await send(start)
+                await send(message)
+                return
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            if "accept-encoding" not in headers.get("vary", "").lower(): # AssetFiles already sets it
+                headers.add_vary_header("Accept-Encoding")
+            if encoding is not None:
+                body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                headers["content-encoding"] = encoding
+                headers["content-length"] = str(len(body))
+                etag = headers.get("etag")
+                if etag is not None and not etag.startswith("W/"):
+                    headers["etag"] = "W/" + etag
+                message = {**message, "body": body}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
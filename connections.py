@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from fastapi import WebSocket
+
+# Outbound WebSocket tuning
+WS_QUEUE_MAX = int(os.getenv("WS_QUEUE_MAX", "256"))           # frames buffered per socket before it is dropped
+WS_BATCH_MAX = int(os.getenv("WS_BATCH_MAX", "64"))            # frames coalesced into one batch frame
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))    # seconds a single write may block
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))  # seconds between heartbeats
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))    # reap sockets silent for this long
+
+# Close codes
+POLICY_VIOLATION = 1008 # slow consumer
+GOING_AWAY = 1001       # missed heartbeats / server shutdown
+
+
+class Connection:
+    __slots__ = ("websocket", "user_id", "queue", "writer", "last_seen", "matches")
+
+    def __init__(self, websocket: WebSocket, user_id: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_QUEUE_MAX)
+        self.writer: Optional[asyncio.Task] = None
+        self.last_seen = time.monotonic()
+        self.matches: Dict[int, int] = {} # partner_id -> match_id, for chat frames
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def enqueue(self, message: dict) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+class ConnectionManager:
+    """Every open socket per user (one per tab/device), each with its own writer.
+
+    Publishers only enqueue, so a slow client never stalls the request that
+    produced the message. The writer drains its queue and coalesces bursts into
+    one `{"type": "batch", "messages": [...]}` frame; a socket whose queue fills
+    up is dropped. A heartbeat pings every socket and reaps the silent ones.
+    """
+
+    def __init__(self, broker):
+        # Map user_id -> sockets held by this process
+        self.active_connections: Dict[int, Set[Connection]] = defaultdict(set)
+        # Messages go through the broker so they reach sockets held by other workers
+        self.broker = broker
+        broker.subscribe("ws", self._deliver)
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._closing: Set[asyncio.Task] = set()
+
+    async def start(self):
+        self._heartbeat = asyncio.create_task(self._ping_loop())
+
+    async def stop(self):
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        for sockets in list(self.active_connections.values()):
+            for conn in list(sockets):
+                await self._close(conn, GOING_AWAY)
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> Connection:
+        await websocket.accept()
+        conn = Connection(websocket, user_id)
+        conn.writer = asyncio.create_task(self._write(conn))
+        self.active_connections[user_id].add(conn)
+        print(f"WS: User {user_id} connected ({len(self.active_connections[user_id])} sockets)")
+        return conn
+
+    def disconnect(self, conn: Connection):
+        sockets = self.active_connections.get(conn.user_id)
+        if not sockets or conn not in sockets:
+            return
+        sockets.discard(conn)
+        if not sockets:
+            del self.active_connections[conn.user_id]
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+        print(f"WS: User {conn.user_id} disconnected")
+
+    def drop(self, conn: Connection, code: int, reason: str):
+        """Disconnect now and close the socket in the background."""
+        print(f"WS: dropping socket of user {conn.user_id}: {reason}")
+        self.disconnect(conn)
+        task = asyncio.create_task(self._close(conn, code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, conn: Connection, code: int):
+        self.disconnect(conn)
+        try:
+            await asyncio.wait_for(conn.websocket.close(code=code), WS_SEND_TIMEOUT)
+        except Exception:
+            pass # Already gone
+
+    async def send_personal_message(self, message: dict, user_id: int):
+        await self.broker.publish("ws", {"user_id": user_id, "message": message})
+
+    async def _deliver(self, event: dict):
+        for conn in list(self.active_connections.get(event["user_id"], ())):
+            if not conn.enqueue(event["message"]):
+                self.drop(conn, POLICY_VIOLATION, "send queue full")
+
+    async def _write(self, conn: Connection):
+        try:
+            while True:
+                frames = [await conn.queue.get()]
+                while len(frames) < WS_BATCH_MAX and not conn.queue.empty():
+                    frames.append(conn.queue.get_nowait())
+                payload = frames[0] if len(frames) == 1 else {"type": "batch", "messages": frames}
+                await asyncio.wait_for(conn.websocket.send_json(payload), WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"WS Error sending to {conn.user_id}: {e}")
+            self.disconnect(conn)
+            await self._close(conn, GOING_AWAY)
+
+    async def _ping_loop(self):
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            now = time.monotonic()
+            for sockets in list(self.active_connections.values()):
+                for conn in list(sockets):
+                    if now - conn.last_seen > WS_IDLE_TIMEOUT:
+                        self.drop(conn, GOING_AWAY, "heartbeat timeout")
+                    elif not conn.enqueue({"type": "ping"}):
+                        self.drop(conn, POLICY_VIOLATION, "send queue full")
@@ -1,7 +1,13 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+import metrics
 
 # Production DB (Postgres) or Local (SQLite)
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -16,9 +22,95 @@ else:
     DATABASE_URL = "sqlite:///./commit_dating.db"
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+# Pool tuning
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))     # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))     # seconds; stay under server/proxy idle limits
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+
+# SQLite connection PRAGMAs: WAL lets readers run alongside the single writer,
+# and busy_timeout makes concurrent writers wait instead of failing with
+# "database is locked"
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")            # safe with WAL
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+
+pool_waits = {}
+
+def _timed_pool(pool_class, name: str):
+    """`pool_class` that records how long each checkout waited (in /api/metrics)."""
+    stats = pool_waits[name] = metrics.WaitStats()
+
+    class TimedPool(pool_class):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                stats.observe(time.perf_counter() - start)
+
+    return TimedPool
+
+def _is_memory(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def pool_options(url, pool_class, name: str) -> dict:
+    if _is_memory(url):
+        return {} # Single shared connection; nothing to tune
+    return {
+        "poolclass": _timed_pool(pool_class, name),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def use_sqlite_pragmas(engine, read_only: bool = False):
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        if not read_only:
+            cursor.execute("PRAGMA journal_mode=WAL") # Persistent; the writer sets it
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.close()
+
+engine = create_engine(DATABASE_URL, connect_args=connect_args, **pool_options(make_url(DATABASE_URL), QueuePool, "primary"))
+use_sqlite_pragmas(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only pool for pure-read GET endpoints, so they never queue behind
+# writers for a connection. DATABASE_READ_URL can point it at a replica.
+def read_url(url: str):
+    url = make_url(url)
+    read_connect_args = dict(connect_args)
+    if url.get_backend_name() == "sqlite" and not _is_memory(url):
+        path = os.path.abspath(url.database)
+        url = url.set(database=f"file:{path}", query={"mode": "ro", "uri": "true"})
+    elif url.get_backend_name() == "postgresql":
+        read_connect_args["options"] = "-c default_transaction_read_only=on"
+    return url, read_connect_args
+
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", DATABASE_URL)
+if DATABASE_READ_URL.startswith("postgres://"):
+    DATABASE_READ_URL = DATABASE_READ_URL.replace("postgres://", "postgresql://", 1)
+
+if _is_memory(make_url(DATABASE_URL)):
+    read_engine = engine # A separate connection would see a different database
+else:
+    _read_url, read_connect_args = read_url(DATABASE_READ_URL)
+    read_engine = create_engine(_read_url, connect_args=read_connect_args, **pool_options(_read_url, QueuePool, "read"))
+    use_sqlite_pragmas(read_engine, read_only=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -27,3 +119,60 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async engine for the hot async handlers (chat, notifications), so their DB
+# I/O neither blocks the event loop nor waits for a threadpool slot.
+# Same database, async driver: aiosqlite locally, asyncpg on Postgres.
+def async_url(url: str):
+    url = make_url(url)
+    async_connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        # asyncpg takes `ssl` instead of libpq's `sslmode`
+        sslmode = url.query.get("sslmode")
+        if sslmode:
+            async_connect_args["ssl"] = sslmode
+            url = url.difference_update_query(["sslmode"])
+        url = url.set(drivername="postgresql+asyncpg")
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url, async_connect_args
+
+ASYNC_DATABASE_URL, async_connect_args = async_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=async_connect_args,
+                                   **pool_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, "async"))
+use_sqlite_pragmas(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def dialect_insert(bind):
+    """INSERT construct for the engine's dialect, which supports ON CONFLICT upserts."""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def pool_snapshot() -> dict:
+    pools = {"primary": engine.pool, "read": read_engine.pool, "async": async_engine.pool}
+    snapshot = {}
+    for name, pool in pools.items():
+        if isinstance(pool, QueuePool):
+            stats = {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+        else:
+            stats = {"status": pool.status()}
+        if name in pool_waits:
+            stats["checkout_wait"] = pool_waits[name].snapshot()
+        snapshot[name] = stats
+    return snapshot
+
+metrics.register("db_pools", pool_snapshot)
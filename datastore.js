@@ -99,14 +99,15 @@ export const datastore = {
     },
 
     // Send Message
-    sendMessage: async (matchPartnerId, text) => {
+    sendMessage: async (matchPartnerId, text, clientId = null) => {
         try {
             await fetch(`${API_BASE}/messages`, {
                 method: 'POST',
                 headers: getHeaders(),
                 body: JSON.stringify({
                     match_id: matchPartnerId,
-                    text: text
+                    text: text,
+                    client_id: clientId // Lets the server drop a resend it already stored
                 })
             });
         } catch (e) {
@@ -115,24 +116,33 @@ export const datastore = {
     },
 
     // Get Messages
-    getMessages: async (matchPartnerId) => {
+    // Latest page by default; pass `before` (from a previous page) to scroll back
+    getMessages: async (matchPartnerId, before = null) => {
         try {
-            const res = await fetch(`${API_BASE}/messages/${matchPartnerId}`, { headers: getAuthHeaders() });
-            return await res.json();
+            const query = before ? `?before=${encodeURIComponent(before)}` : '';
+            const res = await fetch(`${API_BASE}/messages/${matchPartnerId}${query}`, { headers: getAuthHeaders() });
+            return {
+                messages: await res.json(),
+                beforeCursor: res.headers.get('X-Before-Cursor')
+            };
         } catch (e) {
             console.error("API Error getMessages:", e);
-            return [];
+            return { messages: [], beforeCursor: null };
         }
     },
 
-    // Get Profiles (Stack)
-    getProfiles: async () => {
+    // Get Profiles (Stack), one page at a time
+    getProfiles: async (cursor = null) => {
         try {
-            const res = await fetch(`${API_BASE}/profiles`, { headers: getAuthHeaders() });
-            return await res.json();
+            const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+            const res = await fetch(`${API_BASE}/profiles${query}`, { headers: getAuthHeaders() });
+            return {
+                profiles: await res.json(),
+                nextCursor: res.headers.get('X-Next-Cursor')
+            };
         } catch (e) {
             console.error("API Error getProfiles:", e);
-            return [];
+            return { profiles: [], nextCursor: null };
         }
     },
 
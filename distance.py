@@ -0,0 +1,106 @@
+import math
+from array import array
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError: # Pure-Python fallback below
+    np = None
+
+EARTH_RADIUS_KM = 6371
+DEG_TO_RAD = math.pi / 180
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    dLat = (lat2 - lat1) * DEG_TO_RAD
+    dLon = (lng2 - lng1) * DEG_TO_RAD
+    a = math.sin(dLat/2) * math.sin(dLat/2) + \
+        math.cos(lat1 * DEG_TO_RAD) * math.cos(lat2 * DEG_TO_RAD) * \
+        math.sin(dLon/2) * math.sin(dLon/2)
+    a = min(a, 1.0) # Guard against float error for antipodal points
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return EARTH_RADIUS_KM * c
+
+
+class PointArrays:
+    """User ids and coordinates held in contiguous float64 arrays.
+
+    numpy arrays when NumPy is installed, `array('d')` / `array('q')` otherwise.
+    """
+
+    __slots__ = ("ids", "lats", "lngs")
+
+    def __init__(self, ids, lats, lngs):
+        self.ids = ids
+        self.lats = lats
+        self.lngs = lngs
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_points(cls, points: Iterable[Tuple[int, float, float]]) -> "PointArrays":
+        ids, lats, lngs = array('q'), array('d'), array('d')
+        for user_id, lat, lng in points:
+            ids.append(user_id)
+            lats.append(lat)
+            lngs.append(lng)
+        if np is not None:
+            return cls(np.frombuffer(ids, dtype=np.int64), np.frombuffer(lats, dtype=np.float64),
+                       np.frombuffer(lngs, dtype=np.float64))
+        return cls(ids, lats, lngs)
+
+    @classmethod
+    def concat(cls, parts: Sequence["PointArrays"]) -> "PointArrays":
+        if len(parts) == 1:
+            return parts[0]
+        if np is not None:
+            if not parts:
+                return cls(np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, np.float64))
+            return cls(np.concatenate([p.ids for p in parts]), np.concatenate([p.lats for p in parts]),
+                       np.concatenate([p.lngs for p in parts]))
+        ids, lats, lngs = array('q'), array('d'), array('d')
+        for p in parts:
+            ids.extend(p.ids)
+            lats.extend(p.lats)
+            lngs.extend(p.lngs)
+        return cls(ids, lats, lngs)
+
+
+def distances_km(lat: float, lng: float, points: PointArrays):
+    """Haversine distance from (lat, lng) to every point, in one vectorized pass."""
+    if np is None:
+        return [haversine_km(lat, lng, p_lat, p_lng) for p_lat, p_lng in zip(points.lats, points.lngs)]
+
+    lat_r = points.lats * DEG_TO_RAD
+    sin_dlat = np.sin((lat_r - lat * DEG_TO_RAD) / 2)
+    sin_dlng = np.sin((points.lngs - lng) * (DEG_TO_RAD / 2))
+    a = sin_dlat * sin_dlat + math.cos(lat * DEG_TO_RAD) * np.cos(lat_r) * sin_dlng * sin_dlng
+    np.clip(a, 0.0, 1.0, out=a)
+    return (2 * EARTH_RADIUS_KM) * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def nearest_k(lat: float, lng: float, points: PointArrays, k: int,
+              max_km: Optional[float] = None) -> List[Tuple[float, int]]:
+    """Up to `k` (distance_km, user_id) pairs nearest to (lat, lng), nearest first.
+
+    Uses `argpartition` so only the selected k rows are sorted.
+    """
+    if k <= 0 or not len(points):
+        return []
+
+    dist = distances_km(lat, lng, points)
+    if np is None:
+        pairs = [(d, user_id) for d, user_id in zip(dist, points.ids) if max_km is None or d <= max_km]
+        pairs.sort()
+        return pairs[:k]
+
+    ids = points.ids
+    if max_km is not None:
+        mask = dist <= max_km
+        dist, ids = dist[mask], ids[mask]
+    if len(dist) > k:
+        part = np.argpartition(dist, k - 1)[:k]
+        dist, ids = dist[part], ids[part]
+    order = np.lexsort((ids, dist))
+    return list(zip(dist[order].tolist(), ids[order].tolist()))
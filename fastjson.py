@@ -0,0 +1,27 @@
+import json
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError: # Optional: falls back to the stdlib encoder
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    # Same settings as Starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON encoded in one pass from plain dicts/lists.
+
+    Returning it from a handler skips FastAPI's response_model validation and
+    jsonable_encoder walk, so handlers must already produce the documented shape.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Iterable, List, Optional, Set, Tuple
+
+import models
+from database import ReadSessionLocal
+from matching import stack_index, top_k
+from swipes import pass_buffer
+
+# Cursor score used for zero-overlap users: they rank after every scored user
+ZERO_OVERLAP = -1
+
+# Candidate queue tuning
+QUEUE_BATCH = 50       # candidates ranked per build/refill
+QUEUE_LOW_WATER = 10   # refill in the background below this many
+QUEUE_TTL = 300        # seconds before a queue is rebuilt from scratch
+QUEUE_MAX_USERS = 2048 # LRU bound on the number of cached queues
+
+
+def acted_ids_for(db, user_id: int) -> List[int]:
+    acted = [target_id for (target_id,) in db.query(models.Action.target_id).filter(models.Action.user_id == user_id)]
+    # Read-your-writes for passes still in the write-behind buffer
+    return acted + list(pass_buffer.pending_targets(user_id))
+
+
+def rank_page(db, user_id: int, stack: Optional[Iterable[str]], exclude: List[int], limit: int,
+              after: Optional[Tuple[int, int]] = None) -> List[Tuple[int, int]]:
+    """Next `limit` (score, user_id) feed entries after the `after` keyset position."""
+    # Score only users sharing at least one tag (via the inverted index)
+    stack_index.ensure_loaded(db)
+    exclude = list(exclude) + [user_id] # Don't show myself
+    scores = stack_index.score_candidates(stack, exclude=set(exclude))
+
+    # Top-K scored users first...
+    page = []
+    if after is None or after[0] != ZERO_OVERLAP:
+        page = top_k(scores, limit, after)
+
+    # ...then zero-overlap users, which need no scoring, ordered by id
+    if len(page) < limit:
+        fallback = db.query(models.User.id).filter(models.User.id.notin_(exclude + list(scores)))
+        if after is not None and after[0] == ZERO_OVERLAP:
+            fallback = fallback.filter(models.User.id > after[1])
+        fallback = fallback.order_by(models.User.id).limit(limit - len(page))
+        page.extend((ZERO_OVERLAP, uid) for (uid,) in fallback)
+    return page
+
+
+class CandidateQueue:
+    __slots__ = ("stack", "entries", "acted", "last", "exhausted", "refilling", "built_at")
+
+    def __init__(self, stack: Optional[Iterable[str]]):
+        self.stack = stack
+        self.entries = deque()    # (score, user_id), best first
+        self.acted: Set[int] = set() # acted on since the queue was built
+        self.last: Optional[Tuple[int, int]] = None # keyset position of the last entry ever queued
+        self.exhausted = False
+        self.refilling = False
+        self.built_at = time.monotonic()
+
+
+class CandidateQueues:
+    """Per-user materialized "next candidates" queues in a bounded LRU.
+
+    A queue is ranked once, popped by `discard` on every swipe and topped up in
+    the background once it drops below QUEUE_LOW_WATER, so serving the feed
+    head no longer rescans Action rows or rescores users on each request.
+    Once `attach`ed to the broker, discards and invalidations are published so
+    a queue cached by another worker drops the same entries.
+    """
+
+    def __init__(self, max_users: int = QUEUE_MAX_USERS):
+        self.max_users = max_users
+        self.broker = None
+        self._lock = threading.Lock()
+        self._queues: "OrderedDict[int, CandidateQueue]" = OrderedDict()
+
+    def _get(self, user_id: int) -> Optional[CandidateQueue]:
+        queue = self._queues.get(user_id)
+        if queue is not None:
+            if time.monotonic() - queue.built_at > QUEUE_TTL:
+                del self._queues[user_id]
+                return None
+            self._queues.move_to_end(user_id)
+        return queue
+
+    def _extend(self, db, user_id: int, queue: CandidateQueue, exclude: List[int]):
+        start = queue.last
+        batch = rank_page(db, user_id, queue.stack, exclude, QUEUE_BATCH, start)
+        with self._lock:
+            if queue.last != start:
+                return # A concurrent refill got there first
+            queue.entries.extend(e for e in batch if e[1] not in queue.acted)
+            if batch:
+                queue.last = batch[-1]
+            queue.exhausted = len(batch) < QUEUE_BATCH
+
+    def page(self, db, user_id: int, stack: Optional[Iterable[str]], limit: int,
+             after: Optional[Tuple[int, int]] = None) -> Tuple[List[Tuple[int, int]], bool]:
+        """Up to `limit` queued entries after the `after` keyset position, and whether more exist."""
+        with self._lock:
+            queue = self._get(user_id)
+        if queue is None:
+            queue = CandidateQueue(stack)
+            self._extend(db, user_id, queue, acted_ids_for(db, user_id))
+            with self._lock:
+                self._queues[user_id] = queue
+                while len(self._queues) > self.max_users:
+                    self._queues.popitem(last=False)
+
+        after_key = (-after[0], after[1]) if after is not None else None
+        with self._lock:
+            entries = [e for e in queue.entries if after_key is None or (-e[0], e[1]) > after_key]
+        if len(entries) < limit and not queue.exhausted:
+            # Queue ran dry (or the cursor is past it): rank the next batch synchronously
+            with self._lock:
+                if after_key is not None and queue.last is not None and (-queue.last[0], queue.last[1]) < after_key:
+                    queue.last = after
+            self._extend(db, user_id, queue, acted_ids_for(db, user_id))
+            with self._lock:
+                entries = [e for e in queue.entries if after_key is None or (-e[0], e[1]) > after_key]
+
+        return entries[:limit], len(entries) > limit or not queue.exhausted
+
+    def attach(self, broker):
+        self.broker = broker
+        broker.subscribe("feed", self._on_event)
+
+    def discard(self, user_id: int, target_id: int) -> bool:
+        """Pop `target_id` off the user's queue; True if a refill should be scheduled."""
+        with self._lock:
+            queue = self._drop(user_id, target_id)
+            refill = not (queue is None or len(queue.entries) >= QUEUE_LOW_WATER or queue.exhausted or queue.refilling)
+            if refill:
+                queue.refilling = True
+        if self.broker is not None:
+            self.broker.publish_threadsafe("feed", {"user_id": user_id, "target_id": target_id})
+        return refill
+
+    def _drop(self, user_id: int, target_id: int) -> Optional[CandidateQueue]:
+        queue = self._queues.get(user_id)
+        if queue is None:
+            return None
+        queue.acted.add(target_id)
+        if queue.entries and queue.entries[0][1] == target_id:
+            queue.entries.popleft()
+        else:
+            for entry in queue.entries:
+                if entry[1] == target_id:
+                    queue.entries.remove(entry)
+                    break
+        return queue
+
+    def refill(self, user_id: int):
+        with self._lock:
+            queue = self._queues.get(user_id)
+        if queue is None:
+            return
+        db = ReadSessionLocal()
+        try:
+            self._extend(db, user_id, queue, acted_ids_for(db, user_id))
+        finally:
+            queue.refilling = False
+            db.close()
+
+    def clear(self):
+        with self._lock:
+            self._queues.clear()
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._queues.pop(user_id, None)
+        if self.broker is not None:
+            self.broker.publish_threadsafe("feed", {"user_id": user_id})
+
+    async def _on_event(self, event: dict):
+        # Other workers refill their own queue when it runs dry, so no refill
+        # is scheduled here; our own events coming back are harmless
+        with self._lock:
+            if "target_id" in event:
+                self._drop(event["user_id"], event["target_id"])
+            else:
+                self._queues.pop(event["user_id"], None)
+
+
+candidate_queues = CandidateQueues()
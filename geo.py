@@ -0,0 +1,157 @@
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import models
+from distance import EARTH_RADIUS_KM, PointArrays, nearest_k
+
+KM_PER_DEG_LAT = EARTH_RADIUS_KM * math.pi / 180
+MAX_DISTANCE_KM = EARTH_RADIUS_KM * math.pi # Half the circumference
+
+# Grid cell size in degrees (~11 km of latitude)
+CELL_DEG = 0.1
+# First search radius for nearest-neighbour queries without a radius
+START_RADIUS_KM = 5
+
+
+class GridIndex:
+    """In-memory lat/lng grid of user locations.
+
+    Users are bucketed into CELL_DEG x CELL_DEG cells so a radius query only
+    computes distances for users in the cells overlapping the search box.
+    Each cell caches its members as contiguous arrays, so a query concatenates
+    the candidate cells and runs the distance kernel once over all of them.
+    Like the stack index it is per process and loaded lazily. Call `update`
+    on profile writes; once `attach`ed to the broker, moves are also published
+    so other workers apply them to their own grid.
+    """
+
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self.n_cols = int(round(360 / cell_deg))
+        self._lock = threading.Lock()
+        self.cells: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+        self.positions: Dict[int, Tuple[float, float]] = {}
+        self._cell_arrays: Dict[Tuple[int, int], PointArrays] = {}
+        self.loaded = False
+        self.broker = None
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg) % self.n_cols)
+
+    def ensure_loaded(self, db):
+        if self.loaded:
+            return
+        rows = db.query(models.User.id, models.User.location_lat, models.User.location_lng).all()
+        with self._lock:
+            if self.loaded:
+                return
+            for user_id, lat, lng in rows:
+                self._set(user_id, lat, lng)
+            self.loaded = True
+
+    def attach(self, broker):
+        self.broker = broker
+        broker.subscribe("geo", self._on_update)
+
+    def clear(self):
+        """Forget everything; the next `ensure_loaded` rebuilds from the table."""
+        with self._lock:
+            self.cells.clear()
+            self.positions.clear()
+            self._cell_arrays.clear()
+            self.loaded = False
+
+    def update(self, user_id: int, lat: Optional[float], lng: Optional[float]):
+        with self._lock:
+            self._set(user_id, lat, lng)
+        if self.broker is not None:
+            self.broker.publish_threadsafe("geo", {"user_id": user_id, "lat": lat, "lng": lng})
+
+    async def _on_update(self, event: dict):
+        # Setting the same position again is a no-op, so our own event coming back is harmless
+        with self._lock:
+            self._set(event["user_id"], event["lat"], event["lng"])
+
+    def _set(self, user_id: int, lat: Optional[float], lng: Optional[float]):
+        old = self.positions.pop(user_id, None)
+        if old is not None:
+            cell = self._cell(*old)
+            self._cell_arrays.pop(cell, None)
+            self.cells[cell].discard(user_id)
+            if not self.cells[cell]:
+                del self.cells[cell]
+        if lat is None or lng is None:
+            return
+        self.positions[user_id] = (lat, lng)
+        cell = self._cell(lat, lng)
+        self._cell_arrays.pop(cell, None)
+        self.cells[cell].add(user_id)
+
+    def _arrays(self, cell: Tuple[int, int]) -> PointArrays:
+        arrays = self._cell_arrays.get(cell)
+        if arrays is None:
+            arrays = PointArrays.from_points((uid, *self.positions[uid]) for uid in self.cells[cell])
+            self._cell_arrays[cell] = arrays
+        return arrays
+
+    def _candidate_cells(self, lat: float, lng: float, radius_km: float):
+        d_lat = radius_km / KM_PER_DEG_LAT
+        lat_lo, lat_hi = lat - d_lat, lat + d_lat
+        row_lo, row_hi = math.floor(lat_lo / self.cell_deg), math.floor(lat_hi / self.cell_deg)
+
+        # Longitude span widens towards the poles; give up on it near them
+        max_abs_lat = max(abs(lat_lo), abs(lat_hi))
+        if max_abs_lat >= 90:
+            all_cols = True
+            col_lo, col_hi = 0, self.n_cols - 1
+        else:
+            d_lng = d_lat / math.cos(max_abs_lat * (math.pi / 180))
+            col_lo = math.floor((lng - d_lng) / self.cell_deg)
+            col_hi = math.floor((lng + d_lng) / self.cell_deg)
+            all_cols = col_hi - col_lo + 1 >= self.n_cols
+            if all_cols:
+                col_lo, col_hi = 0, self.n_cols - 1
+
+        n_box = (row_hi - row_lo + 1) * (col_hi - col_lo + 1)
+        if n_box >= len(self.cells):
+            # Sparse grid: cheaper to filter the occupied cells than to walk the box
+            for (row, col) in self.cells:
+                if row_lo <= row <= row_hi and (all_cols or (col - col_lo) % self.n_cols <= col_hi - col_lo):
+                    yield (row, col)
+            return
+
+        for row in range(row_lo, row_hi + 1):
+            for col in range(col_lo, col_hi + 1):
+                if (row, col % self.n_cols) in self.cells:
+                    yield (row, col % self.n_cols)
+
+    def within(self, lat: float, lng: float, radius_km: float, limit: int,
+               exclude: Set[int]) -> List[Tuple[float, int]]:
+        """Up to `limit` (distance_km, user_id) pairs within `radius_km`, nearest first."""
+        with self._lock:
+            points = PointArrays.concat([self._arrays(cell) for cell in self._candidate_cells(lat, lng, radius_km)])
+        found = nearest_k(lat, lng, points, limit + len(exclude), max_km=radius_km)
+        return [(d, user_id) for d, user_id in found if user_id not in exclude][:limit]
+
+    def nearest(self, lat: float, lng: float, limit: int, radius_km: Optional[float] = None,
+                exclude: Optional[Set[int]] = None) -> List[Tuple[float, int]]:
+        """Up to `limit` nearest users, optionally bounded by `radius_km`.
+
+        Without a radius the search starts small and doubles until it has
+        `limit` users or covers the whole globe.
+        """
+        exclude = exclude or set()
+        if radius_km is not None:
+            return self.within(lat, lng, radius_km, limit, exclude)
+
+        radius = START_RADIUS_KM
+        while True:
+            found = self.within(lat, lng, radius, limit, exclude)
+            if len(found) >= limit or radius >= MAX_DISTANCE_KM:
+                return found
+            radius *= 2
+
+
+geo_index = GridIndex()
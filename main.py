@@ -1,31 +1,48 @@
-from fastapi import FastAPI, Depends, HTTPException, Body, UploadFile, File, Header, Request
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Depends, HTTPException, Body, UploadFile, File, Header, Request, Response, Query, BackgroundTasks
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
+import asyncio
 import datetime
 import math
 import os
-import shutil
 import json
 from fastapi import WebSocket, WebSocketDisconnect
 
-# Ensure uploads directory exists
-UPLOAD_DIR = "static/uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 import models
-from database import engine, get_db
+import migrations
+import metrics
+import uploads
+import assets
+import seed
+from database import engine, async_engine, get_db, get_read_db, get_async_db
+from matching import calculate_match_score, stack_index
+from feed import candidate_queues
+from geo import geo_index
+from notifications import unread_total, unread_versions
+from pagination import encode_cursor, decode_cursor
+from fastjson import FastJSONResponse
+from compression import CompressionMiddleware
+from profiles import profile_cache, public_profile, public_profiles
+from broker import create_broker
+from connections import ConnectionManager
+from scraper import NEWS_REFRESH, news_service
+from swipes import record_action, new_match_event, pass_buffer
+from chat import ChatProtocol, client_message_id, find_match, mark_read, save_message, new_message_event, read_receipt_event
+
+migrations.upgrade(engine)
 
-models.Base.metadata.create_all(bind=engine)
+# Ensure uploads directory exists
+os.makedirs(uploads.UPLOAD_DIR, exist_ok=True)
 
 app = FastAPI()
 
 # Mount static/uploads specifically to be accessible at /static/uploads
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", assets.AssetFiles(directory="static", suffixes=assets.STATIC_SUFFIXES), name="static")
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,34 +50,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Before-Cursor", "X-After-Cursor"],
 )
+app.add_middleware(CompressionMiddleware) # Thresholds and levels: COMPRESS_* env vars
+app.add_middleware(uploads.UploadLimitMiddleware) # Caps upload bodies before they are spooled to disk
 
 # --- WebSocket Manager ---
-class ConnectionManager:
-    def __init__(self):
-        # Map user_id -> WebSocket
-        self.active_connections: Dict[int, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-        print(f"WS: User {user_id} connected")
-
-    def disconnect(self, user_id: int):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-            print(f"WS: User {user_id} disconnected")
-
-    async def send_personal_message(self, message: dict, user_id: int):
-        if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
+broker = create_broker()
+manager = ConnectionManager(broker)
+chat_protocol = ChatProtocol(manager)
+profile_cache.attach(broker) # Invalidations reach other workers through the broker
+unread_versions.attach(broker)
+geo_index.attach(broker) # Moves and new users reach every worker's grid
+stack_index.attach(broker) # Likewise for stack edits and the feed's posting lists
+candidate_queues.attach(broker) # Swipes in one worker drop the target from every worker's queue
+
+@app.on_event("startup")
+async def start_background_services():
+    await broker.start()
+    await manager.start()
+    pass_buffer.start()
+    await asyncio.to_thread(assets.precompress_all)
+    if NEWS_REFRESH:
+        await news_service.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    pass_buffer.stop() # Flush buffered passes before exiting
+    await manager.stop()
+    await broker.stop()
+    await async_engine.dispose()
+    uploads.shutdown()
+    await news_service.stop()
+
+@app.websocket("/ws/{user_id}")
+async def websocket_endpoint(websocket: WebSocket, user_id: int):
+    conn = await manager.connect(websocket, user_id)
+    try:
+        while True:
+            # Any frame (including {"type": "pong"} heartbeat replies) keeps the socket alive
+            text = await websocket.receive_text()
+            conn.touch()
             try:
-                await websocket.send_json(message)
-            except Exception as e:
-                print(f"WS Error sending to {user_id}: {e}")
-                self.disconnect(user_id)
-
-manager = ConnectionManager()
+                frame = json.loads(text)
+            except ValueError:
+                frame = None
+            if not isinstance(frame, dict):
+                conn.enqueue({"type": "error", "detail": "Frames must be JSON objects"})
+                continue
+            try:
+                await chat_protocol.handle(conn, frame)
+            except Exception as e: # A bad frame must not take the connection down
+                print(f"WS: frame from user {user_id} failed: {e!r}")
+                conn.enqueue({"type": "error", "client_id": frame.get("client_id"), "detail": "Frame could not be processed"})
+    except (WebSocketDisconnect, RuntimeError):
+        pass # RuntimeError: the socket was already closed by the server
+    finally:
+        manager.disconnect(conn)
 
 # Pydantic Schemas
 class ActionCreate(BaseModel):
@@ -70,6 +116,7 @@ class ActionCreate(BaseModel):
 class MessageCreate(BaseModel):
     match_id: int
     text: str
+    client_id: Optional[str] = None # Same id as the unacked socket send it replaces
 
 class UserRegister(BaseModel):
     name: str
@@ -97,6 +144,8 @@ class UserRead(BaseModel):
     image: str
     location_lat: float
     location_lng: float
+    image_thumb: Optional[str] = None # Resized variants of uploaded images
+    image_card: Optional[str] = None
     match_score: int = 0
     
     class Config:
@@ -111,63 +160,56 @@ def get_current_user(x_user_id: Optional[str] = Header(None)):
         raise HTTPException(status_code=401, detail="Missing X-User-Id header")
     return int(x_user_id)
 
-# Helper: Jaccard Similarity
-def calculate_match_score(stack1: List[str], stack2: List[str]) -> int:
-    if not stack1 or not stack2:
-        return 0
-    s1 = set([s.lower() for s in stack1])
-    s2 = set([s.lower() for s in stack2])
-    intersection = len(s1.intersection(s2))
-    union = len(s1.union(s2))
-    if union == 0: return 0
-    return int((intersection / union) * 100)
+# Helper: (timestamp, id) keyset cursor for chat history
+def decode_message_cursor(cursor: str):
+    ts, msg_id = decode_cursor(cursor, (str, int))
+    try:
+        return datetime.datetime.fromisoformat(ts), msg_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @app.get("/api/profiles", response_model=List[UserRead])
-def get_profiles(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_profiles(limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None,
+                 current_user_id: int = Depends(get_current_user), db: Session = Depends(get_read_db)):
     # Get current user for matching
-    me = db.query(models.User).filter(models.User.id == current_user_id).first()
+    me = public_profile(db, current_user_id)
     if not me:
         raise HTTPException(status_code=404, detail="Current user not found")
 
-    # Get profiles NOT acted upon by current user
-    acted_ids = [a.target_id for a in db.query(models.Action).filter(models.Action.user_id == current_user_id).all()]
-    acted_ids.append(current_user_id) # Don't show myself
-    
-    profiles = db.query(models.User).filter(models.User.id.notin_(acted_ids)).all()
-    
-    # Calculate Scores and Sort
-    results = []
-    for p in profiles:
-        p_dict = UserRead.from_orm(p).dict()
-        p_dict['match_score'] = calculate_match_score(me.stack, p.stack)
-        results.append(p_dict)
-        
-    # Sort by Score DESC
-    return sorted(results, key=lambda x: x['match_score'], reverse=True)
+    # Pages come from my precomputed candidate queue, popped on every swipe
+    after = decode_cursor(cursor, (int, int)) if cursor else None
+    page, has_more = candidate_queues.page(db, current_user_id, me.stack, limit, after)
+
+    # Serialize only the rows on this page
+    users = public_profiles(db, [uid for _, uid in page])
+    results = [users[user_id].to_dict(max(score, 0)) for score, user_id in page if user_id in users]
+
+    headers = {}
+    if page and has_more:
+        headers["X-Next-Cursor"] = encode_cursor(*page[-1])
+    return FastJSONResponse(results, headers=headers)
 
 @app.get("/api/profiles/{user_id}", response_model=UserRead)
-def get_profile(user_id: int, db: Session = Depends(get_db), current_user_id: Optional[int] = Depends(get_current_user)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+def get_profile(user_id: int, db: Session = Depends(get_read_db), current_user_id: Optional[int] = Depends(get_current_user)):
+    user = public_profile(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
     # Optional: Calculate score if looking at someone else
     score = 0
     if current_user_id:
-         me = db.query(models.User).filter(models.User.id == current_user_id).first()
+         me = public_profile(db, current_user_id)
          if me:
              score = calculate_match_score(me.stack, user.stack)
              
-    p_dict = UserRead.from_orm(user).dict()
-    p_dict['match_score'] = score
-    return p_dict
+    return FastJSONResponse(user.to_dict(score))
 
 @app.get("/api/profile/me", response_model=UserRead)
-def get_my_profile(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == current_user_id).first()
+def get_my_profile(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    user = public_profile(db, current_user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return FastJSONResponse(user.to_dict())
 
 @app.put("/api/profile/me", response_model=UserRead)
 def update_my_profile(update_data: UserUpdate, current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -183,14 +225,18 @@ def update_my_profile(update_data: UserUpdate, current_user_id: int = Depends(ge
     
     db.commit()
     db.refresh(user)
-    return user
+    stack_index.update(user.id, user.stack)
+    geo_index.update(user.id, user.location_lat, user.location_lng)
+    candidate_queues.invalidate(user.id) # Scores depend on my stack
+    profile_cache.invalidate(user.id)
+    return FastJSONResponse(public_profile(db, user.id).to_dict())
 
 @app.post("/api/upload")
-async def upload_image(file: UploadFile = File(...)):
-    file_location = f"{UPLOAD_DIR}/{file.filename}"
-    with open(file_location, "wb+") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    return {"url": f"/{file_location}"}
+async def upload_image(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    # Streamed to disk under its content hash; thumbnails are made after the response
+    name = await uploads.store_upload(file)
+    background_tasks.add_task(uploads.generate_variants, name)
+    return {"url": f"{uploads.UPLOAD_URL}/{name}"}
 
 # Auth Endpoints
 @app.post("/api/register")
@@ -213,6 +259,9 @@ def register(user: UserRegister, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    stack_index.update(new_user.id, new_user.stack)
+    geo_index.update(new_user.id, new_user.location_lat, new_user.location_lng)
+    profile_cache.invalidate(new_user.id) # A reused id must not serve a stale profile
     return {"id": new_user.id, "name": new_user.name}
 
 @app.post("/api/login")
@@ -223,258 +272,206 @@ def login(creds: UserLogin, db: Session = Depends(get_db)):
     return {"id": user.id, "name": user.name}
 
 @app.post("/api/action")
-def perform_action(action: ActionCreate, current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Save action
-    new_action = models.Action(
-        user_id=current_user_id,
-        target_id=action.target_id,
-        action_type=action.action_type,
-        timestamp=datetime.datetime.now()
-    )
-    db.add(new_action)
-    db.commit()
-    
-    # Check Match if Like
-    is_match = False
-    if action.action_type == 'like':
-        reverse_like = db.query(models.Action).filter(
-            models.Action.user_id == action.target_id,
-            models.Action.target_id == current_user_id,
-            models.Action.action_type == 'like'
-        ).first()
-        
-        if reverse_like:
-            match = models.Match(
-                user1_id=current_user_id,
-                user2_id=action.target_id,
-                timestamp=datetime.datetime.now()
-            )
-            db.add(match)
-            db.commit()
-            is_match = True
+def perform_action(action: ActionCreate, background_tasks: BackgroundTasks, current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
+    if action.action_type == 'pass' and pass_buffer.enabled:
+        # Passes never create matches: buffer them for the next bulk flush
+        pass_buffer.add(current_user_id, action.target_id)
+        is_match, new_match_id = False, None
+    else:
+        # Action upsert and match creation in one transaction
+        pass_buffer.discard(current_user_id, action.target_id)
+        is_match, new_match_id = record_action(db, current_user_id, action.target_id, action.action_type)
+
+    # Pop the target off my candidate queue, topping it up in the background
+    if candidate_queues.discard(current_user_id, action.target_id):
+        background_tasks.add_task(candidate_queues.refill, current_user_id)
+
+    # Tell both sides about a new match right away
+    if new_match_id is not None:
+        background_tasks.add_task(manager.send_personal_message, new_match_event(new_match_id, action.target_id), current_user_id)
+        background_tasks.add_task(manager.send_personal_message, new_match_event(new_match_id, current_user_id), action.target_id)
             
     return {"success": True, "match": is_match}
 
 @app.get("/api/matches", response_model=List[UserRead])
-def get_matches(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
-    matches = db.query(models.Match).filter(
+def get_matches(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    matches = db.query(models.Match.user1_id, models.Match.user2_id).filter(
         or_(models.Match.user1_id == current_user_id, models.Match.user2_id == current_user_id)
     ).all()
     
     matched_ids = []
-    for m in matches:
-        if m.user1_id == current_user_id:
-            matched_ids.append(m.user2_id)
+    for user1_id, user2_id in matches:
+        if user1_id == current_user_id:
+            matched_ids.append(user2_id)
         else:
-            matched_ids.append(m.user1_id)
+            matched_ids.append(user1_id)
             
-    return db.query(models.User).filter(models.User.id.in_(matched_ids)).all()
+    return FastJSONResponse([p.to_dict() for p in public_profiles(db, sorted(matched_ids)).values()])
 
 @app.get("/api/notifications")
-def get_notifications(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
-    count = db.query(models.Message).filter(
-        models.Message.sender_id != current_user_id, # Msg from others
-        models.Message.match_id.in_(
-            db.query(models.Match.id).filter(
-                or_(models.Match.user1_id == current_user_id, models.Match.user2_id == current_user_id)
-            )
-        ),
-        models.Message.is_read == False
-    ).count()
+async def get_notifications(response: Response, if_none_match: Optional[str] = Header(None),
+                            current_user_id: int = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # Unchanged since the client's last poll: 304 without touching the DB
+    etag = unread_versions.etag(current_user_id)
+    if etag and if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    count = await unread_total(db, current_user_id)
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache" # Always revalidate
     return {"unread_count": count}
 
 @app.get("/api/messages/{match_partner_id}")
-def get_messages(match_partner_id: int, current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_messages(match_partner_id: int, response: Response, background_tasks: BackgroundTasks, before: Optional[str] = None, after: Optional[str] = None,
+                       limit: int = Query(50, ge=1, le=200),
+                       current_user_id: int = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     # Find match ID
-    match = db.query(models.Match).filter(
-        or_(
-            (models.Match.user1_id == current_user_id) & (models.Match.user2_id == match_partner_id),
-            (models.Match.user1_id == match_partner_id) & (models.Match.user2_id == current_user_id)
-        )
-    ).first()
+    match = await find_match(db, current_user_id, match_partner_id)
     
     if not match:
         return []
-        
-    msgs = db.query(models.Message).filter(models.Message.match_id == match.id).all()
+
+    # Keyset pagination on (timestamp, id): latest page by default,
+    # `before` scrolls back into history, `after` fetches newer messages
+    ts, msg_id = models.Message.timestamp, models.Message.id
+    query = select(models.Message).where(models.Message.match_id == match.id)
+    if after:
+        after_ts, after_id = decode_message_cursor(after)
+        query = query.where(or_(ts > after_ts, and_(ts == after_ts, msg_id > after_id)))
+        msgs = (await db.scalars(query.order_by(ts, msg_id).limit(limit))).all()
+    else:
+        if before:
+            before_ts, before_id = decode_message_cursor(before)
+            query = query.where(or_(ts < before_ts, and_(ts == before_ts, msg_id < before_id)))
+        msgs = (await db.scalars(query.order_by(ts.desc(), msg_id.desc()).limit(limit))).all()
+        msgs.reverse()
     
     # Mark incoming messages as read
-    for m in msgs:
-        if m.sender_id != current_user_id and not m.is_read:
-            m.is_read = True
-            db.add(m)
-    db.commit()
+    marked = await mark_read(db, match.id, current_user_id)
+
+    # Tell the sender their messages were read, so they don't have to poll
+    if marked:
+        background_tasks.add_task(manager.send_personal_message, read_receipt_event(current_user_id), match_partner_id)
+
+    if msgs:
+        if not after and len(msgs) == limit:
+            response.headers["X-Before-Cursor"] = encode_cursor(models.isoformat_utc(msgs[0].timestamp), msgs[0].id)
+        response.headers["X-After-Cursor"] = encode_cursor(models.isoformat_utc(msgs[-1].timestamp), msgs[-1].id)
     
     # Format for frontend 
     formatted = []
     for m in msgs:
         formatted.append({
+            "id": m.id,
             "text": m.content,
             "sender": "me" if m.sender_id == current_user_id else "them",
-            "timestamp": m.timestamp
+            "timestamp": models.isoformat_utc(m.timestamp)
         })
     return formatted
 
 @app.post("/api/messages")
-async def send_message(msg: MessageCreate, current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
+async def send_message(msg: MessageCreate, current_user_id: int = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     # 'match_id' in legacy JS was actually PROFILE ID of the other user. 
     partner_id = msg.match_id 
     
-    match = db.query(models.Match).filter(
-        or_(
-            (models.Match.user1_id == current_user_id) & (models.Match.user2_id == partner_id),
-            (models.Match.user1_id == partner_id) & (models.Match.user2_id == current_user_id)
-        )
-    ).first()
+    match = await find_match(db, current_user_id, partner_id)
     
     if not match:
         raise HTTPException(status_code=404, detail="Match not found")
         
-    db_msg = models.Message(
-        match_id=match.id,
-        sender_id=current_user_id,
-        content=msg.text,
-        timestamp=datetime.datetime.now().isoformat(),
-        is_read=False
-    )
-    db.add(db_msg)
-    db.commit()
+    db_msg, created = await save_message(db, match.id, current_user_id, partner_id, msg.text,
+                                         client_message_id(msg.client_id))
     
     # --- WebSocket Broadcast ---
-    await manager.send_personal_message({
-        "type": "new_message",
-        "sender_id": current_user_id,
-        "text": msg.text,
-        "timestamp": db_msg.timestamp
-    }, partner_id)
+    # (chat.html sends over the socket instead; this stays as the HTTP fallback)
+    event = new_message_event(db_msg)
+    if created: # Skip the push for a deduplicated resend
+        await manager.send_personal_message(event, partner_id)
     
-    return {"success": True}
+    return {"success": True, "id": event["id"]}
+
+@app.get("/api/metrics")
+def get_metrics():
+    # Process-local: DB pool checkout waits and cache counters
+    return metrics.snapshot()
+
+@app.get("/api/news")
+async def get_news():
+    # Served from the cache; a stale cache triggers a background refresh
+    return await news_service.snapshot()
 
 @app.get("/api/nearby")
-def get_nearby(lat: float, lng: float, current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Simple calculation in python
-    # Get all users
-    users = db.query(models.User).filter(models.User.id != current_user_id).all()
-    
+def get_nearby(lat: float, lng: float, radius_km: Optional[float] = Query(None, gt=0), limit: int = Query(50, ge=1, le=200),
+               current_user_id: int = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    # Only scan grid cells around (lat, lng) instead of every user
+    geo_index.ensure_loaded(db)
+    nearest = geo_index.nearest(lat, lng, limit, radius_km, exclude={current_user_id})
+
+    users = public_profiles(db, [uid for _, uid in nearest])
     results = []
-    for u in users:
-        # Haversine
-        R = 6371
-        dLat = (u.location_lat - lat) * (math.pi / 180)
-        dLon = (u.location_lng - lng) * (math.pi / 180)
-        a = math.sin(dLat/2) * math.sin(dLat/2) + \
-            math.cos(lat * (math.pi/180)) * math.cos(u.location_lat * (math.pi/180)) * \
-            math.sin(dLon/2) * math.sin(dLon/2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        d = R * c
-        
+    for d, user_id in nearest:
+        if user_id not in users:
+            continue
         # Return user dict with distance
-        u_dict = UserRead.from_orm(u).dict()
+        u_dict = users[user_id].to_dict()
         u_dict['distance'] = round(d)
         results.append(u_dict)
-        
-    return sorted(results, key=lambda x: x['distance'])
+
+    return FastJSONResponse(results)
 
 @app.get("/api/likes/received", response_model=List[UserRead])
-def get_likes_received(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_likes_received(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_read_db)):
     # 1. Who liked me?
-    incoming_likes = db.query(models.Action).filter(
+    incoming_likes = db.query(models.Action.user_id).filter(
         models.Action.target_id == current_user_id,
         models.Action.action_type == 'like'
     ).all()
-    sender_ids = [a.user_id for a in incoming_likes]
+    sender_ids = [user_id for (user_id,) in incoming_likes]
     
     if not sender_ids:
-        return []
+        return FastJSONResponse([])
         
     # 2. Who have I already acted on? (Liked or Passed)
-    my_actions = db.query(models.Action).filter(models.Action.user_id == current_user_id).all()
-    my_acted_ids = set([a.target_id for a in my_actions])
+    my_actions = db.query(models.Action.target_id).filter(models.Action.user_id == current_user_id).all()
+    my_acted_ids = set([target_id for (target_id,) in my_actions]) | pass_buffer.pending_targets(current_user_id)
     
     # 3. Filter: Only show people I haven't acted on yet
     pending_ids = [uid for uid in sender_ids if uid not in my_acted_ids]
     
-    return db.query(models.User).filter(models.User.id.in_(pending_ids)).all()
+    return FastJSONResponse([p.to_dict() for p in public_profiles(db, sorted(pending_ids)).values()])
 
 @app.get("/api/likes/sent", response_model=List[UserRead])
-def get_likes_sent(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
-    actions = db.query(models.Action).filter(
+def get_likes_sent(current_user_id: int = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    actions = db.query(models.Action.target_id).filter(
         models.Action.user_id == current_user_id,
         models.Action.action_type == 'like'
     ).all()
-    target_ids = [a.target_id for a in actions]
-    return db.query(models.User).filter(models.User.id.in_(target_ids)).all()
-
-# Static Files
-app.mount("/", StaticFiles(directory=".", html=True), name="static")
-
+    target_ids = [target_id for (target_id,) in actions]
+    return FastJSONResponse([p.to_dict() for p in public_profiles(db, sorted(target_ids)).values()])
 
 @app.get("/api/seed")
 def seed_db(db: Session = Depends(get_db)):
-    # Initial Data (No IDs, let DB assign)
-    profiles = [
-        {
-            "name": "Sarah Chen",
-            "role": "Frontend Architect",
-            "bio": "git commit -m 'looking for someone to center my div'",
-            "stack": ["React", "TypeScript", "Tailwind", "Three.js", "Figma"],
-            "image": "https://images.unsplash.com/photo-1494790108377-be9c29b29330?auto=format&fit=crop&w=500&q=80",
-            "location_lat": 40.7228, "location_lng": -73.9960
-        },
-        {
-            "name": "Alex Rodriguez",
-            "role": "Systems Engineer",
-            "bio": "Rust enthusiast. I promise not to rewrite your codebase.",
-            "stack": ["Rust", "Go", "Kubernetes", "Linux", "C++"],
-            "image": "https://images.unsplash.com/photo-1500648767791-00dcc994a43e?auto=format&fit=crop&w=500&q=80",
-            "location_lat": 40.6928, "location_lng": -74.0010
-        },
-        {
-            "name": "Jordan Taylor",
-            "role": "AI Researcher",
-            "bio": "Training models by day, debugging life by night.",
-            "stack": ["Python", "PyTorch", "TensorFlow", "CUDA", "FastAPI"],
-            "image": "https://images.unsplash.com/photo-1573496359142-b8d87734a5a2?auto=format&fit=crop&w=500&q=80",
-            "location_lat": 40.7278, "location_lng": -74.0160
-        },
-        {
-            "name": "Emily Zhang",
-            "role": "Full Stack Dev",
-            "bio": "Tabs over spaces. VIM over VS Code. Fight me.",
-            "stack": ["Node.js", "Vue", "Postgres", "AWS", "Python"],
-            "image": "https://images.unsplash.com/photo-1580489944761-15a19d654956?auto=format&fit=crop&w=500&q=80",
-            "location_lat": 40.7078, "location_lng": -74.0260
-        },
+    # The seed.py personas, minus their fixed ids (let DB assign), keyed by the same
+    # user{id}@test.com emails so accounts from `python seed.py` are recognized.
+    # For large synthetic datasets run `python seed.py --users N`.
+    emails = {p["id"]: f"user{p['id']}@test.com" for p in seed.PERSONAS}
+    existing = {email for (email,) in db.query(models.User.email).filter(models.User.email.in_(emails.values()))}
+    new_users = [
         {
-            "name": "David Kim",
-            "role": "DevOps Engineer",
-            "bio": "If it works on my machine, we ship my machine.",
-            "stack": ["Docker", "Terraform", "CI/CD", "Bash", "Go"],
-            "image": "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?auto=format&fit=crop&w=500&q=80",
-            "location_lat": 40.7428, "location_lng": -73.9760
+            "name": p["name"], "email": emails[p["id"]], "password": "password", "role": p["role"], "bio": p["bio"],
+            "stack": p["stack"], "image": p["image"], "location_lat": p["location_lat"], "location_lng": p["location_lng"]
         }
+        for p in seed.PERSONAS if emails[p["id"]] not in existing
     ]
-
-    added_count = 0
-    for p in profiles:
-        # Check if exists by name (simple check)
-        exists = db.query(models.User).filter(models.User.email == f"{p['name'].split(' ')[0].lower()}@test.com").first()
-        if not exists:
-            user = models.User(
-                name=p['name'],
-                email=f"{p['name'].split(' ')[0].lower()}@test.com",
-                password="password",
-                role=p['role'],
-                bio=p['bio'],
-                stack=p['stack'],
-                image=p['image'],
-                location_lat=p['location_lat'],
-                location_lng=p['location_lng']
-            )
-            db.add(user)
-            added_count += 1
-    
+    db.bulk_insert_mappings(models.User, new_users)
+    added_count = len(new_users)
     db.commit()
+    # Drop the in-memory indexes and queues so they are rebuilt with the seeded profiles on next use
+    stack_index.clear()
+    geo_index.clear()
+    candidate_queues.clear()
+    profile_cache.clear()
     return {"message": f"Seeding Complete. Added {added_count} new profiles."}
 
 @app.get("/api/debug")
@@ -489,6 +486,11 @@ def debug_status(db: Session = Depends(get_db)):
         "db_url_set": os.getenv("DATABASE_URL") is not None
     }
 
+# Static Files
+# Frontend pages and scripts from the project root: top-level allowlisted files only
+app.mount("/", assets.AssetFiles(directory=".", suffixes=assets.FRONTEND_SUFFIXES, recursive=False, html=True), name="frontend")
+
+
 if __name__ == "__main__":
     import uvicorn
     # Kill old process on 8080 if possible? No.
@@ -0,0 +1,125 @@
+import heapq
+import threading
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import models
+
+
+def normalize_stack(stack: Optional[Iterable[str]]) -> FrozenSet[str]:
+    if not stack:
+        return frozenset()
+    return frozenset(s.lower() for s in stack)
+
+
+# Helper: Jaccard Similarity
+def calculate_match_score(stack1: List[str], stack2: List[str]) -> int:
+    if not stack1 or not stack2:
+        return 0
+    s1 = normalize_stack(stack1)
+    s2 = normalize_stack(stack2)
+    intersection = len(s1.intersection(s2))
+    union = len(s1.union(s2))
+    if union == 0: return 0
+    return int((intersection / union) * 100)
+
+
+class StackIndex:
+    """In-process inverted index: normalized stack tag -> posting list of user ids.
+
+    Lets the feed score only users that share at least one tag with the viewer,
+    instead of running the Jaccard over every row in the users table.
+    The index is per process; it is loaded lazily on first use and kept in sync
+    by calling `update` wherever a user's stack is written. Once `attach`ed to
+    the broker, updates are also published so other workers apply them too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.user_tags: Dict[int, FrozenSet[str]] = {}
+        self.loaded = False
+        self.broker = None
+
+    def ensure_loaded(self, db):
+        if self.loaded:
+            return
+        rows = db.query(models.User.id, models.User.stack).all()
+        with self._lock:
+            if self.loaded:
+                return
+            for user_id, stack in rows:
+                self._set(user_id, normalize_stack(stack))
+            self.loaded = True
+
+    def attach(self, broker):
+        self.broker = broker
+        broker.subscribe("stack", self._on_update)
+
+    def clear(self):
+        """Forget everything; the next `ensure_loaded` rebuilds from the table."""
+        with self._lock:
+            self.postings.clear()
+            self.user_tags.clear()
+            self.loaded = False
+
+    def update(self, user_id: int, stack: Optional[List[str]]):
+        with self._lock:
+            self._set(user_id, normalize_stack(stack))
+        if self.broker is not None:
+            self.broker.publish_threadsafe("stack", {"user_id": user_id, "stack": list(stack or [])})
+
+    async def _on_update(self, event: dict):
+        # Re-applying the same stack is a no-op, so our own event coming back is harmless
+        with self._lock:
+            self._set(event["user_id"], normalize_stack(event["stack"]))
+
+    def _set(self, user_id: int, tags: FrozenSet[str]):
+        old = self.user_tags.get(user_id, frozenset())
+        for tag in old - tags:
+            posting = self.postings.get(tag)
+            if posting is not None:
+                posting.discard(user_id)
+                if not posting:
+                    del self.postings[tag]
+        for tag in tags - old:
+            self.postings[tag].add(user_id)
+        self.user_tags[user_id] = tags
+
+    def score_candidates(self, stack: Optional[List[str]], exclude: Set[int]) -> Dict[int, int]:
+        """Jaccard scores (0-100) for every user sharing a tag with `stack`."""
+        tags = normalize_stack(stack)
+        if not tags:
+            return {}
+
+        overlap: Dict[int, int] = defaultdict(int)
+        with self._lock:
+            for tag in tags:
+                for user_id in self.postings.get(tag, ()):
+                    if user_id not in exclude:
+                        overlap[user_id] += 1
+
+            scores = {}
+            for user_id, intersection in overlap.items():
+                union = len(tags) + len(self.user_tags[user_id]) - intersection
+                scores[user_id] = int((intersection / union) * 100)
+        return scores
+
+
+stack_index = StackIndex()
+
+
+def top_k(scores: Dict[int, int], limit: int, after: Optional[Tuple[int, int]] = None) -> List[Tuple[int, int]]:
+    """Best `limit` (score, user_id) pairs ordered by score DESC, id ASC.
+
+    Uses a bounded heap, so the cost is O(n log limit) rather than a full sort.
+    `after` is the (score, user_id) of the last row of the previous page.
+    """
+    items = ((score, user_id) for user_id, score in scores.items())
+    if after is not None:
+        after_score, after_id = after
+        items = (
+            (score, user_id) for score, user_id in items
+            if score < after_score or (score == after_score and user_id > after_id)
+        )
+    return heapq.nsmallest(limit, items, key=lambda t: (-t[0], t[1]))
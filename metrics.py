@@ -0,0 +1,47 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict
+
+# Process-local counters served by /api/metrics. Modules register a callable
+# returning a JSON-able snapshot under a name; nothing is pushed anywhere.
+
+BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+_sources: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, source: Callable[[], dict]):
+    _sources[name] = source
+
+
+def snapshot() -> dict:
+    return {name: source() for name, source in _sources.items()}
+
+
+class WaitStats:
+    """Count, average, max and a coarse histogram of wait times."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        with self._lock:
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+            self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            labels = [f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+            return {
+                "count": self.count,
+                "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "histogram_ms": dict(zip(labels, self.buckets)),
+            }
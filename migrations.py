@@ -0,0 +1,202 @@
+"""Versioned schema migrations, applied in order at startup.
+
+Replaces the bare `create_all`: a fresh database gets the current schema and is
+stamped with the latest version, while an existing SQLite or Postgres database
+is upgraded in place one migration at a time. The applied version is kept in a
+one-row `schema_version` table. Workers starting together are serialized
+(advisory lock on Postgres, BEGIN IMMEDIATE on SQLite), and each step re-checks
+the version, so a migration is applied exactly once.
+
+    python migrations.py           # upgrade to the latest version
+    python migrations.py current   # print the applied version
+"""
+import datetime
+import sys
+from contextlib import contextmanager
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+
+import models
+
+_meta = MetaData()
+schema_version = Table("schema_version", _meta, Column("version", Integer, nullable=False))
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+def head() -> int:
+    return max((v for v, _, _ in MIGRATIONS), default=0)
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(select(schema_version.c.version)).scalar() or 0
+
+def _stamp(conn, version: int):
+    conn.execute(schema_version.delete())
+    conn.execute(schema_version.insert().values(version=version))
+
+# Arbitrary, app-wide key for pg_advisory_lock
+MIGRATION_LOCK_KEY = 0x636F6D6D
+
+@contextmanager
+def _upgrade_lock(conn):
+    # Every uvicorn worker upgrades at import: only one may do it at a time.
+    # Postgres holds a session-level advisory lock for the whole upgrade;
+    # SQLite is serialized per step by BEGIN IMMEDIATE in `_step`.
+    if conn.dialect.name != "postgresql":
+        yield
+        return
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.commit()
+
+@contextmanager
+def _step(conn):
+    with conn.begin():
+        if conn.dialect.name == "sqlite":
+            conn.exec_driver_sql("BEGIN IMMEDIATE") # Write lock before the version is read
+        yield
+
+def upgrade(engine):
+    with engine.connect() as conn, _upgrade_lock(conn):
+        with _step(conn):
+            _meta.create_all(conn)
+            if not inspect(conn).has_table("users"):
+                # Fresh database: create the current schema directly
+                models.Base.metadata.create_all(conn)
+                _stamp(conn, head())
+                return
+
+        for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+            with _step(conn):
+                # Re-read under the lock: another worker may have applied it meanwhile.
+                # Legacy databases (created by create_all) have no version row: treat as 0
+                if version <= current_version(conn):
+                    continue
+                print(f"DB: migrating to {version}: {description}")
+                fn(conn)
+                _stamp(conn, version)
+
+
+# --- Migrations ---
+
+@migration(1, "composite indexes on actions, matches and messages; unique canonical match pairs")
+def _composite_indexes(conn):
+    # Canonicalize pairs (user1_id < user2_id); SET sees the old values on both sides
+    conn.execute(text(
+        "UPDATE matches SET user1_id = user2_id, user2_id = user1_id WHERE user1_id > user2_id"
+    ))
+
+    # Merge duplicate matches into the oldest one before adding the unique index
+    keep = {}
+    for match_id, user1_id, user2_id in conn.execute(text("SELECT id, user1_id, user2_id FROM matches ORDER BY id")):
+        pair = (user1_id, user2_id)
+        if pair not in keep:
+            keep[pair] = match_id
+            continue
+        conn.execute(text("UPDATE messages SET match_id = :keep WHERE match_id = :dup"),
+                     {"keep": keep[pair], "dup": match_id})
+        conn.execute(text("DELETE FROM matches WHERE id = :dup"), {"dup": match_id})
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_actions_user_target_type ON actions (user_id, target_id, action_type)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_actions_target_type ON actions (target_id, action_type)"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_matches_pair ON matches (user1_id, user2_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_matches_user2 ON matches (user2_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_messages_match_read_sender ON messages (match_id, is_read, sender_id)"))
+
+
+TIMESTAMP_TABLES = ("actions", "matches", "messages")
+
+def _parse_legacy_timestamp(value):
+    # Legacy rows hold str(datetime) or .isoformat() strings of naive server time (UTC on the PaaS)
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@migration(2, "timezone-aware DateTime timestamps on actions, matches and messages")
+def _native_timestamps(conn):
+    if conn.dialect.name == "postgresql":
+        for table in TIMESTAMP_TABLES:
+            conn.execute(text(
+                f"ALTER TABLE {table} ALTER COLUMN timestamp TYPE TIMESTAMP WITH TIME ZONE "
+                f"USING (NULLIF(timestamp, '')::timestamp AT TIME ZONE 'UTC')"
+            ))
+    else:
+        # SQLite keeps its column types; rewrite the values into SQLAlchemy's
+        # DateTime storage format (naive UTC), which also sorts chronologically
+        for table in TIMESTAMP_TABLES:
+            rows = conn.execute(text(f"SELECT id, timestamp FROM {table}")).fetchall()
+            updates = []
+            for row_id, value in rows:
+                parsed = _parse_legacy_timestamp(value)
+                updates.append({"id": row_id, "ts": parsed.strftime("%Y-%m-%d %H:%M:%S.%f") if parsed else None})
+            if updates:
+                conn.execute(text(f"UPDATE {table} SET timestamp = :ts WHERE id = :id"), updates)
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_actions_timestamp ON actions (timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_matches_timestamp ON matches (timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_messages_timestamp ON messages (timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_messages_match_timestamp ON messages (match_id, timestamp, id)"))
+
+
+@migration(3, "denormalized per-(user, match) unread counters")
+def _unread_counters(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS unread_counters ("
+        "user_id INTEGER NOT NULL REFERENCES users (id), "
+        "match_id INTEGER NOT NULL REFERENCES matches (id), "
+        "count INTEGER NOT NULL DEFAULT 0, "
+        "PRIMARY KEY (user_id, match_id))"
+    ))
+    # Backfill from the messages that are currently unread; the recipient is
+    # whichever member of the match did not send the message
+    conn.execute(text(
+        "INSERT INTO unread_counters (user_id, match_id, count) "
+        "SELECT CASE WHEN m.sender_id = ma.user1_id THEN ma.user2_id ELSE ma.user1_id END, m.match_id, COUNT(*) "
+        "FROM messages m JOIN matches ma ON ma.id = m.match_id "
+        "WHERE m.is_read = :unread "
+        "GROUP BY CASE WHEN m.sender_id = ma.user1_id THEN ma.user2_id ELSE ma.user1_id END, m.match_id"
+    ), {"unread": False})
+
+
+@migration(4, "one action per (user, target) for race-free swipe upserts")
+def _unique_actions(conn):
+    # Keep the latest decision per pair, which is what the upsert will do from now on
+    conn.execute(text(
+        "DELETE FROM actions WHERE id NOT IN (SELECT MAX(id) FROM actions GROUP BY user_id, target_id)"
+    ))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_actions_user_target ON actions (user_id, target_id)"))
+
+
+@migration(5, "client-supplied message ids so resent messages are stored once")
+def _message_client_ids(conn):
+    conn.execute(text("ALTER TABLE messages ADD COLUMN client_id VARCHAR"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_messages_sender_client ON messages (sender_id, client_id)"))
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    if len(sys.argv) > 1 and sys.argv[1] == "current":
+        with engine.connect() as conn:
+            print(f"schema version {current_version(conn)} (head {head()})")
+    else:
+        upgrade(engine)
+        print(f"DB: at schema version {head()}")
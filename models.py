@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, JSON
+import datetime
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, JSON, Index, DateTime, and_
 from sqlalchemy.orm import relationship
+from typing import Optional
 from database import Base
 
 class User(Base):
@@ -27,7 +29,13 @@ class Action(Base):
     user_id = Column(Integer, ForeignKey("users.id")) # Who performed the action
     target_id = Column(Integer, ForeignKey("users.id")) # Who was acted upon
     action_type = Column(String) # 'like', 'pass'
-    timestamp = Column(String)
+    timestamp = Column(DateTime(timezone=True), index=True) # UTC
+
+    __table_args__ = (
+        Index("uq_actions_user_target", "user_id", "target_id", unique=True), # One decision per pair (upsert key)
+        Index("ix_actions_user_target_type", "user_id", "target_id", "action_type"), # Reverse-like check, my actions
+        Index("ix_actions_target_type", "target_id", "action_type"), # Likes received
+    )
 
 class Match(Base):
     __tablename__ = "matches"
@@ -35,7 +43,13 @@ class Match(Base):
     id = Column(Integer, primary_key=True, index=True)
     user1_id = Column(Integer, ForeignKey("users.id"))
     user2_id = Column(Integer, ForeignKey("users.id"))
-    timestamp = Column(String)
+    timestamp = Column(DateTime(timezone=True), index=True) # UTC
+
+    # Pairs are stored canonically (user1_id < user2_id), see canonical_pair()
+    __table_args__ = (
+        Index("uq_matches_pair", "user1_id", "user2_id", unique=True),
+        Index("ix_matches_user2", "user2_id"),
+    )
 
 class Message(Base):
     __tablename__ = "messages"
@@ -44,5 +58,43 @@ class Message(Base):
     match_id = Column(Integer, ForeignKey("matches.id"))
     sender_id = Column(Integer, ForeignKey("users.id"))
     content = Column(String)
-    timestamp = Column(String)
+    timestamp = Column(DateTime(timezone=True), index=True) # UTC
     is_read = Column(Boolean, default=False)
+    client_id = Column(String, nullable=True) # Sender-chosen idempotency key, for resends
+
+    __table_args__ = (
+        Index("ix_messages_match_read_sender", "match_id", "is_read", "sender_id"), # Unread counts
+        Index("ix_messages_match_timestamp", "match_id", "timestamp", "id"), # Chat history, in order
+        Index("uq_messages_sender_client", "sender_id", "client_id", unique=True), # NULLs never collide
+    )
+
+class UnreadCounter(Base):
+    __tablename__ = "unread_counters"
+
+    # Denormalized unread count per recipient and match, kept by send/read paths
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True) # Recipient
+    match_id = Column(Integer, ForeignKey("matches.id"), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def isoformat_utc(value: Optional[datetime.datetime]) -> Optional[str]:
+    """ISO 8601 with an explicit UTC offset (SQLite hands back naive UTC values)."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.isoformat()
+
+
+def canonical_pair(a: int, b: int):
+    """(user1_id, user2_id) for a match between a and b: smaller id first."""
+    return (a, b) if a < b else (b, a)
+
+
+def match_pair(a: int, b: int):
+    """WHERE clause selecting the match between a and b."""
+    user1_id, user2_id = canonical_pair(a, b)
+    return and_(Match.user1_id == user1_id, Match.user2_id == user2_id)
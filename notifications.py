@@ -0,0 +1,93 @@
+import os
+import threading
+import uuid
+from collections import defaultdict
+from typing import Dict, Optional
+
+from sqlalchemy import case, func, select, update
+
+import models
+from database import dialect_insert
+
+# Serve 304s for unchanged /api/notifications polls without touching the DB.
+# Versions are tracked per process; once `attach`ed to the broker, bumps are
+# published so every worker's version moves (needs a shared broker, e.g.
+# WS_BROKER=sqlite, when running more than one worker).
+ETAG_ENABLED = os.getenv("NOTIFICATIONS_ETAG", "1") != "0"
+
+
+async def bump_unread(db, user_id: int, match_id: int):
+    """+1 on the recipient's counter for this match (upsert, same transaction as the message).
+
+    Call `unread_versions.bump(user_id)` once the transaction has committed.
+    """
+    insert = dialect_insert(db.bind)
+    table = models.UnreadCounter.__table__
+    await db.execute(
+        insert(table).values(user_id=user_id, match_id=match_id, count=1).on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.match_id],
+            set_={"count": table.c.count + 1}
+        )
+    )
+
+
+async def decrement_unread(db, user_id: int, match_id: int, marked: int) -> bool:
+    """Take the `marked` messages just read off the reader's counter for this match (never below 0).
+
+    Subtracting rather than zeroing keeps the +1 of a message that committed
+    after the mark-read UPDATE (Postgres READ COMMITTED). True if the counter
+    changed (bump the version after commit).
+    """
+    if marked <= 0:
+        return False
+    count = models.UnreadCounter.count
+    result = await db.execute(
+        update(models.UnreadCounter).where(
+            models.UnreadCounter.user_id == user_id,
+            models.UnreadCounter.match_id == match_id,
+            count != 0
+        ).values(count=case((count > marked, count - marked), else_=0))
+    )
+    return result.rowcount > 0
+
+
+async def unread_total(db, user_id: int) -> int:
+    return await db.scalar(
+        select(func.coalesce(func.sum(models.UnreadCounter.count), 0)).where(models.UnreadCounter.user_id == user_id)
+    )
+
+
+class UnreadVersions:
+    """Per-user change counters backing the notifications ETag."""
+
+    def __init__(self):
+        self.broker = None
+        self._lock = threading.Lock()
+        self._versions: Dict[int, int] = defaultdict(int)
+        # Tags issued by another process (or before a restart) never match
+        self._epoch = uuid.uuid4().hex[:8]
+
+    def attach(self, broker):
+        self.broker = broker
+        broker.subscribe("unread", self._on_bump)
+
+    def bump(self, user_id: int):
+        self._bump(user_id)
+        if self.broker is not None:
+            self.broker.publish_threadsafe("unread", {"user_id": user_id})
+
+    def _bump(self, user_id: int):
+        # Only "changed" matters, so our own event coming back is harmless
+        with self._lock:
+            self._versions[user_id] += 1
+
+    async def _on_bump(self, event: dict):
+        self._bump(event["user_id"])
+
+    def etag(self, user_id: int) -> Optional[str]:
+        if not ETAG_ENABLED:
+            return None
+        return f'W/"{self._epoch}-{user_id}-{self._versions[user_id]}"'
+
+
+unread_versions = UnreadVersions()
@@ -0,0 +1,26 @@
+import base64
+import json
+from typing import Tuple
+
+from fastapi import HTTPException
+
+# Opaque keyset cursors: a base64url-encoded JSON array of the sort key of the
+# last row on a page. Clients must treat them as opaque strings.
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, types: Tuple[type, ...]) -> tuple:
+    """Decode a cursor whose elements must have exactly the given types."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # bool is an int subclass, but true/false is never a valid sort key
+    if any(isinstance(v, bool) or not isinstance(v, t) for v, t in zip(values, types)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(values)
@@ -0,0 +1,193 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import String, type_coerce
+from sqlalchemy.orm import Session
+
+import metrics
+import models
+import uploads
+
+# Public profile reads: only the columns UserRead exposes (never email,
+# password or username), with `stack` fetched as raw JSON text and parsed
+# through a cache, so repeated profiles skip the JSON decode entirely.
+
+STACK_CACHE_SIZE = 8192
+
+# Profile cache: bounded LRU with a TTL as the backstop for writes that don't
+# go through `invalidate` (other tools, missed cross-process events)
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+
+
+class PublicProfile(NamedTuple):
+    id: int
+    name: str
+    role: str
+    bio: str
+    stack: Tuple[str, ...]
+    image: str
+    location_lat: float
+    location_lng: float
+    image_thumb: Optional[str]
+    image_card: Optional[str]
+
+    def to_dict(self, match_score: int = 0) -> dict:
+        # Same shape as UserRead.dict(); orjson/json encode the tuple as a list
+        p_dict = self._asdict()
+        p_dict["match_score"] = match_score
+        return p_dict
+
+
+_COLUMNS = (
+    models.User.id, models.User.name, models.User.role, models.User.bio,
+    type_coerce(models.User.stack, String).label("stack"), # Raw JSON text, parsed below
+    models.User.image, models.User.location_lat, models.User.location_lng,
+)
+
+
+@lru_cache(maxsize=STACK_CACHE_SIZE)
+def _compact_stack(tags: Tuple[str, ...]) -> Tuple[str, ...]:
+    # Identical stacks share one tuple, and tags share interned strings
+    return tuple(sys.intern(tag) for tag in tags)
+
+
+@lru_cache(maxsize=STACK_CACHE_SIZE)
+def _parse_stack_text(raw: str) -> Tuple[str, ...]:
+    return _compact_stack(tuple(json.loads(raw) or ()))
+
+
+def parse_stack(value) -> Tuple[str, ...]:
+    if not value:
+        return ()
+    if isinstance(value, str):
+        return _parse_stack_text(value)
+    # Drivers with native JSON support (psycopg2) hand back a list
+    return _compact_stack(tuple(value))
+
+
+def _profile(row) -> PublicProfile:
+    # Variant URLs are resolved once per cache fill; until the background resize
+    # finishes they fall back to the original image (the TTL picks them up later)
+    return PublicProfile(row[0], row[1], row[2], row[3], parse_stack(row[4]), row[5], row[6], row[7],
+                         uploads.variant_url(row[5], "thumb"), uploads.variant_url(row[5], "card"))
+
+
+def _load_profiles(db: Session, user_ids) -> Dict[int, PublicProfile]:
+    rows = db.query(*_COLUMNS).filter(models.User.id.in_(user_ids))
+    return {row[0]: _profile(row) for row in rows}
+
+
+class ProfileCache:
+    """Process-local LRU/TTL cache of public profiles keyed by user id.
+
+    Call `invalidate` wherever a profile is written. Once `attach`ed to the
+    broker, invalidations are also published so other workers drop their
+    copy (cross-process only with a shared broker, e.g. WS_BROKER=sqlite).
+    """
+
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.broker = None
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[float, PublicProfile]]" = OrderedDict()
+        # Bumped on invalidate (per key) and clear (all keys): a load that
+        # started before the bump must not cache what it read
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def attach(self, broker):
+        self.broker = broker
+        broker.subscribe("profile", self._on_invalidate)
+
+    def get_many(self, db: Session, user_ids: Iterable[int]) -> Dict[int, PublicProfile]:
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0] < now:
+                    del self._entries[user_id]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    missing.append(user_id)
+                    continue
+                self._entries.move_to_end(user_id)
+                found[user_id] = entry[1]
+            self.hits += len(found)
+            self.misses += len(missing)
+            epoch = self._epoch
+            generations = {user_id: self._generations.get(user_id, 0) for user_id in missing}
+
+        if missing:
+            loaded = _load_profiles(db, missing)
+            with self._lock:
+                expires = time.monotonic() + self.ttl
+                for user_id, profile in loaded.items():
+                    if self._epoch != epoch or self._generations.get(user_id, 0) != generations[user_id]:
+                        continue # Invalidated while loading: serve it once, don't cache it
+                    self._entries[user_id] = (expires, profile)
+                    self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            found.update(loaded)
+        return found
+
+    def invalidate(self, user_id: int):
+        self._drop(user_id)
+        if self.broker is not None:
+            self.broker.publish_threadsafe("profile", {"user_id": user_id})
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def _drop(self, user_id: int):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    async def _on_invalidate(self, event: dict):
+        self._drop(event["user_id"])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "expirations": self.expirations, "invalidations": self.invalidations}
+
+
+profile_cache = ProfileCache()
+
+
+def public_profiles(db: Session, user_ids: Iterable[int]) -> Dict[int, PublicProfile]:
+    """Public profiles by id, in request order; missing ids are simply absent."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    profiles = profile_cache.get_many(db, user_ids)
+    return {user_id: profiles[user_id] for user_id in user_ids if user_id in profiles}
+
+
+def public_profile(db: Session, user_id: int) -> Optional[PublicProfile]:
+    return profile_cache.get_many(db, [user_id]).get(user_id)
+
+
+metrics.register("stack_cache", lambda: _parse_stack_text.cache_info()._asdict())
+metrics.register("profile_cache", profile_cache.snapshot)
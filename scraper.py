@@ -1,41 +1,273 @@
+import asyncio
+import email.utils
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
 import httpx
-from bs4 import BeautifulSoup
-from typing import List, Dict
 
-HN_URL = "https://news.ycombinator.com/"
+import metrics
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError: # Optional fast path
+    LexborHTMLParser = None
+
+try:
+    import lxml # noqa: F401 (only needs to be importable for BeautifulSoup)
+    BS4_PARSER = "lxml"
+except ImportError:
+    BS4_PARSER = "html.parser"
+
+HN_URL = os.getenv("HN_URL", "https://news.ycombinator.com/")
+NEWS_DB = os.getenv("NEWS_DB", "news.db")
+NEWS_TTL = float(os.getenv("NEWS_TTL", "300")) # Seconds before cached headlines are refreshed
+NEWS_MIN_INTERVAL = float(os.getenv("NEWS_MIN_INTERVAL", "60")) # Never hit upstream more often than this
+NEWS_REFRESH = os.getenv("NEWS_REFRESH", "1") == "1" # Background refresher on startup
+HEADLINE_LIMIT = 5
+
+# HN structure: <tr class="athing">...<span class="titleline"><a ...>Title</a></span>...</tr>
+TITLE_SELECTOR = "tr.athing .titleline > a"
+
+
+def parse_headlines(html: str, base_url: str = HN_URL, limit: int = HEADLINE_LIMIT) -> List[Dict[str, str]]:
+    if LexborHTMLParser is not None:
+        links = [(node.text(), node.attributes.get("href") or "") for node in LexborHTMLParser(html).css(TITLE_SELECTOR)]
+    else:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, BS4_PARSER)
+        links = [(node.get_text(), node.get("href") or "") for node in soup.select(TITLE_SELECTOR)]
 
-async def scrape_hn_ai_headlines() -> List[Dict[str, str]]:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(HN_URL)
-        response.raise_for_status()
-        
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
     headlines_data = []
-    
-    # HN structure: <tr class="athing">...<span class="titleline"><a ...>Title</a></span>...</tr>
-    items = soup.select('tr.athing')
-    
-    for item in items:
-        title_element = item.select_one('.titleline > a')
-        if not title_element:
-            continue
-            
-        title = title_element.get_text()
-        url = title_element.get('href')
-        
+    for title, url in links:
         # Filter for "AI" (case-insensitive)
-        if "ai" in title.lower():
-            # Handle relative URLs (like "item?id=...")
-            if not url.startswith('http'):
-                url = HN_URL + url
-                
-            headlines_data.append({
-                "title": title,
-                "url": url
-            })
-            
-        if len(headlines_data) >= 5:
+        if "ai" not in title.lower():
+            continue
+        # Handle relative URLs (like "item?id=...")
+        headlines_data.append({"title": title, "url": urljoin(base_url, url)})
+        if len(headlines_data) >= limit:
             break
-            
     return headlines_data
+
+
+class NewsStore:
+    """Headlines plus the validators of the page they came from, in news.db."""
+
+    def __init__(self, path: str = NEWS_DB):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS headlines (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS feed_state (
+                source TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )""")
+        return conn
+
+    def load(self, source: str) -> Optional[dict]:
+        conn = self._connect()
+        try:
+            state = conn.execute("SELECT etag, last_modified, fetched_at FROM feed_state WHERE source = ?", (source,)).fetchone()
+            if state is None:
+                return None
+            rows = conn.execute("SELECT title, url FROM headlines ORDER BY id").fetchall()
+            return {"etag": state[0], "last_modified": state[1], "fetched_at": state[2],
+                    "headlines": [{"title": title, "url": url} for title, url in rows]}
+        finally:
+            conn.close()
+
+    def save(self, source: str, etag: Optional[str], last_modified: Optional[str], fetched_at: float,
+             headlines: Optional[List[Dict[str, str]]]):
+        """Record a fetch; `headlines` is None for a 304 (only the timestamp moves)."""
+        conn = self._connect()
+        try:
+            with conn:
+                if headlines is not None:
+                    conn.execute("DELETE FROM headlines")
+                    conn.executemany("INSERT INTO headlines (title, url) VALUES (?, ?)",
+                                     [(h["title"], h["url"]) for h in headlines])
+                conn.execute(
+                    "INSERT INTO feed_state (source, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(source) DO UPDATE SET etag = excluded.etag, "
+                    "last_modified = excluded.last_modified, fetched_at = excluded.fetched_at",
+                    (source, etag, last_modified, fetched_at))
+        finally:
+            conn.close()
+
+
+class NewsService:
+    """TTL-cached HN headlines, refreshed in the background.
+
+    `snapshot` only ever reads the cache: when it is stale it schedules a
+    refresh and returns what it has. Refreshes are single-flight, use
+    conditional requests and are spaced at least `min_interval` apart.
+    """
+
+    def __init__(self, url: str = HN_URL, store: Optional[NewsStore] = None, ttl: float = NEWS_TTL,
+                 min_interval: float = NEWS_MIN_INTERVAL):
+        self.url = url
+        self.store = store or NewsStore()
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self.headlines: List[Dict[str, str]] = []
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.fetched_at: Optional[float] = None
+        self.last_attempt = float("-inf")
+        self.fetches = 0
+        self.not_modified = 0
+        self.failures = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # One pooled client for every refresh instead of a new one per call
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+                headers={"User-Agent": "commit-dating-news/1.0"},
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def load(self):
+        if self._loaded:
+            return
+        try:
+            state = await asyncio.to_thread(self.store.load, self.url)
+        except Exception as e:
+            # Unreadable news.db: serve/refresh without it, retry on the next call
+            self.failures += 1
+            print(f"News: loading {self.store.path} failed: {e}")
+            return
+        if state is not None:
+            self.headlines = state["headlines"]
+            self.etag, self.last_modified = state["etag"], state["last_modified"]
+            self.fetched_at = state["fetched_at"]
+        self._loaded = True
+
+    async def start(self):
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._refresh_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._refresh_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def is_stale(self) -> bool:
+        return self.fetched_at is None or time.time() - self.fetched_at >= self.ttl
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Fetch the page if stale; returns True if the headlines changed."""
+        async with self._lock:
+            await self.load()
+            now = time.monotonic()
+            if not force and (not self.is_stale() or now - self.last_attempt < self.min_interval):
+                return False
+            self.last_attempt = now
+
+            headers = {}
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+            try:
+                response = await self.client.get(self.url, headers=headers)
+                if response.status_code == 304:
+                    self.not_modified += 1
+                    self.fetched_at = time.time()
+                    await self._persist(None)
+                    return False
+                response.raise_for_status()
+                # Parsing is CPU work: keep it off the event loop
+                headlines = await asyncio.to_thread(parse_headlines, response.text, str(response.url))
+            except Exception as e:
+                self.failures += 1
+                print(f"News: refresh of {self.url} failed: {e}")
+                return False
+
+            self.fetches += 1
+            self._loaded = True # Fresher than anything a late load would bring back
+            self.headlines = headlines
+            self.etag = response.headers.get("etag")
+            self.last_modified = response.headers.get("last-modified")
+            self.fetched_at = time.time()
+            await self._persist(headlines)
+            return True
+
+    async def _persist(self, headlines: Optional[List[Dict[str, str]]]):
+        # The in-memory cache is already updated: a failed write (locked or
+        # full disk) only costs the copy that survives restarts
+        try:
+            await asyncio.to_thread(self.store.save, self.url, self.etag, self.last_modified, self.fetched_at, headlines)
+        except Exception as e:
+            self.failures += 1
+            print(f"News: saving headlines to {self.store.path} failed: {e}")
+
+    def schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def snapshot(self) -> dict:
+        await self.load()
+        stale = self.is_stale()
+        if stale:
+            self.schedule_refresh()
+        fetched_at = None
+        if self.fetched_at is not None:
+            fetched_at = email.utils.formatdate(self.fetched_at, usegmt=True)
+        return {"headlines": self.headlines, "fetched_at": fetched_at, "stale": stale}
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e: # Never let the refresher die
+                self.failures += 1
+                print(f"News: refresh loop error: {e}")
+            if self.fetched_at is None:
+                delay = self.min_interval
+            else:
+                delay = max(self.fetched_at + self.ttl - time.time(), self.min_interval)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {"fetches": self.fetches, "not_modified": self.not_modified, "failures": self.failures,
+                "headlines": len(self.headlines), "stale": self.is_stale()}
+
+
+news_service = NewsService()
+metrics.register("news", news_service.stats)
+
+
+async def scrape_hn_ai_headlines() -> List[Dict[str, str]]:
+    # Kept for existing callers: now served from the cache, refreshing if stale
+    await news_service.refresh()
+    return news_service.headlines
@@ -1,15 +1,30 @@
-from database import SessionLocal, engine
-import models
+import argparse
+import csv
+import datetime
+import io
 import json
+import random
+import time
+from itertools import accumulate
+
+from sqlalchemy import text
+
+import migrations
+import models
+from database import engine
 
-# Re-create tables
-models.Base.metadata.drop_all(bind=engine)
-models.Base.metadata.create_all(bind=engine)
+# Synthetic data generator. Re-creates the tables, then bulk-loads the five
+# hand-written personas (ids 1-5, with the Sarah/Jordan match) followed by
+# generated users with role-based stacks, city-clustered locations, a
+# power-law swipe graph, the matches it implies, chat histories and unread
+# counters. The same --seed always produces the same data.
+# Rows go in with executemany batches (COPY on Postgres/psycopg2), with the
+# secondary indexes dropped during the load and rebuilt afterwards.
+# Usage: python seed.py [--users N] [--seed S] [--swipes AVG] [--batch ROWS]
 
-db = SessionLocal()
+UTC = datetime.timezone.utc
 
-# Initial Data
-profiles = [
+PERSONAS = [
     {
         "id": 1,
         "name": "Sarah Chen",
@@ -57,32 +72,383 @@ profiles = [
     }
 ]
 
-for p in profiles:
-    user = models.User(
-        id=p['id'],
-        username=f"user{p['id']}",
-        name=p['name'],
-        role=p['role'],
-        bio=p['bio'],
-        stack=p['stack'],
-        image=p['image'],
-        location_lat=p['location_lat'],
-        location_lng=p['location_lng'],
-        email=f"user{p['id']}@test.com",
-        password="password"
-    )
-    db.merge(user)
-
-# Matches to test chat
-# Sarah (1) likes Jordan (3)
-action1 = models.Action(user_id=1, target_id=3, action_type='like', timestamp='2025-01-01T12:00:00')
-db.add(action1)
-# Jordan (3) likes Sarah (1) -> Match
-action2 = models.Action(user_id=3, target_id=1, action_type='like', timestamp='2025-01-01T12:05:00')
-db.add(action2)
-match = models.Match(user1_id=3, user2_id=1, timestamp='2025-01-01T12:05:00')
-db.add(match)
-
-db.commit()
-db.close()
-print("Database re-seeded with rich stacks.")
+FIRST_NAMES = [
+    "Sarah", "Alex", "Jordan", "Emily", "David", "Priya", "Wei", "Maria", "James", "Aisha", "Lucas", "Sofia",
+    "Omar", "Hana", "Daniel", "Chloe", "Mateo", "Yuki", "Noah", "Fatima", "Liam", "Ananya", "Ethan", "Zoe",
+    "Kai", "Elena", "Arjun", "Mia", "Samuel", "Ines", "Leo", "Nadia", "Ravi", "Grace", "Tomas", "Amara",
+]
+LAST_NAMES = [
+    "Chen", "Rodriguez", "Taylor", "Zhang", "Kim", "Patel", "Nguyen", "Garcia", "Smith", "Khan", "Müller",
+    "Rossi", "Tanaka", "Okafor", "Silva", "Johnson", "Kowalski", "Haddad", "Larsen", "Singh", "Novak",
+    "Dubois", "Ivanova", "Cohen", "Fernandez", "Park", "Ali", "Schmidt", "Brown", "Sato", "Costa", "Reyes",
+]
+
+# (weight, roles, {tag: weight}) per archetype; stacks are drawn mostly from
+# the archetype's pool, plus the odd tag everyone uses
+ARCHETYPES = [
+    (24, ["Frontend Engineer", "Frontend Architect", "UI Engineer"],
+     {"React": 10, "TypeScript": 9, "JavaScript": 8, "Tailwind": 5, "Next.js": 5, "Vue": 4, "CSS": 4,
+      "Svelte": 2, "Figma": 2, "Three.js": 1, "Angular": 2, "Vite": 2}),
+    (26, ["Backend Engineer", "Full Stack Dev", "Software Engineer"],
+     {"Python": 10, "Node.js": 8, "Go": 6, "Postgres": 8, "Java": 5, "Django": 4, "FastAPI": 4, "Redis": 5,
+      "GraphQL": 3, "Kotlin": 2, "Ruby": 2, "Rails": 2, "MongoDB": 3}),
+    (14, ["DevOps Engineer", "SRE", "Platform Engineer"],
+     {"Docker": 10, "Kubernetes": 9, "Terraform": 7, "AWS": 8, "Linux": 6, "Bash": 5, "CI/CD": 5, "Go": 4,
+      "GCP": 3, "Prometheus": 3, "Ansible": 2}),
+    (14, ["Data Scientist", "ML Engineer", "AI Researcher"],
+     {"Python": 10, "PyTorch": 8, "Pandas": 7, "SQL": 6, "TensorFlow": 4, "CUDA": 3, "Jupyter": 5, "Spark": 3,
+      "scikit-learn": 5, "R": 2, "FastAPI": 2}),
+    (10, ["Systems Engineer", "Embedded Engineer", "Compiler Engineer"],
+     {"Rust": 9, "C++": 9, "C": 7, "Linux": 7, "Go": 3, "LLVM": 2, "Assembly": 2, "Zig": 2, "CUDA": 2}),
+    (12, ["Mobile Developer", "iOS Engineer", "Android Engineer"],
+     {"Swift": 8, "Kotlin": 8, "React Native": 6, "Flutter": 5, "Dart": 4, "Firebase": 4, "TypeScript": 3,
+      "Objective-C": 1, "Java": 2}),
+]
+COMMON_TAGS = {"Git": 6, "Linux": 4, "Docker": 4, "Vim": 2, "SQL": 3, "Python": 3, "AWS": 2}
+
+# (lat, lng, weight, spread in degrees): users cluster around tech hubs
+CITIES = [
+    (40.7128, -74.0060, 20, 0.08),   # New York
+    (37.7749, -122.4194, 16, 0.06),  # San Francisco
+    (47.6062, -122.3321, 8, 0.06),   # Seattle
+    (30.2672, -97.7431, 6, 0.07),    # Austin
+    (42.3601, -71.0589, 6, 0.05),    # Boston
+    (41.8781, -87.6298, 6, 0.08),    # Chicago
+    (43.6532, -79.3832, 6, 0.07),    # Toronto
+    (51.5074, -0.1278, 12, 0.09),    # London
+    (52.5200, 13.4050, 8, 0.07),     # Berlin
+    (48.8566, 2.3522, 6, 0.06),      # Paris
+    (12.9716, 77.5946, 10, 0.08),    # Bangalore
+    (1.3521, 103.8198, 4, 0.05),     # Singapore
+    (35.6762, 139.6503, 6, 0.09),    # Tokyo
+    (-33.8688, 151.2093, 4, 0.08),   # Sydney
+]
+
+PHOTOS = [
+    "1494790108377-be9c29b29330", "1500648767791-00dcc994a43e", "1573496359142-b8d87734a5a2",
+    "1580489944761-15a19d654956", "1507003211169-0a1dd7228f2d", "1438761681033-6461ffad8d80",
+    "1472099645785-5658abf4ff4e", "1544005313-94ddf0286df2", "1506794778202-cad84cf45f1d",
+    "1534528741775-53994a69daeb", "1517841905240-472988babdf9", "1519085360753-af0119f7cbe7",
+]
+BIOS = [
+    "Looking for someone to pair program with on Sundays.",
+    "I write tests. Yes, before the code.",
+    "Will refactor your legacy code and your life.",
+    "My love language is a clean git history.",
+    "Fluent in {tag} and sarcasm.",
+    "Currently mass-migrating everything to {tag}.",
+    "Ask me about my {tag} side project (there are four).",
+    "Dark mode only. Non-negotiable.",
+    "On-call survivor. Looking for my primary.",
+    "Will debug for coffee.",
+]
+MESSAGES = [
+    "Hey! Loved your stack 👀", "Tabs or spaces?", "Vim or Emacs, choose wisely.", "What are you building lately?",
+    "Haha same", "That's awesome", "Coffee this week?", "I just mass-renamed a monorepo, ask me anything",
+    "Did you see the outage yesterday?", "My CI has been red for three days", "Sure, Thursday works!",
+    "Which timezone are you in?", "Just shipped a release 🚀", "lol", "Sounds good", "Send me the repo link",
+]
+
+END_DATE = datetime.datetime(2025, 6, 1, tzinfo=UTC)
+HISTORY_DAYS = 180
+ZIPF_S = 0.9            # Popularity skew of swipe targets
+LOCAL_SWIPES = 0.8      # Share of swipes on people in the same city
+MAX_SWIPES = 2000
+
+
+def _weighted_sample(rng, weights: dict, k: int):
+    """k distinct keys, drawn with probability proportional to their weight."""
+    pool = dict(weights)
+    picked = []
+    while pool and len(picked) < k:
+        tags, w = list(pool), list(pool.values())
+        tag = rng.choices(tags, weights=w)[0]
+        picked.append(tag)
+        del pool[tag]
+    return picked
+
+
+def _pair_owner(a: int, b: int) -> int:
+    # Only one side of each pair ever "decides" it, so the generated likes can't
+    # accidentally be mutual without the matching row being created too
+    a, b = models.canonical_pair(a, b)
+    return a if ((a * 2654435761) ^ (b * 40503)) & 0x100 else b
+
+
+class Generator:
+    def __init__(self, users: int, seed: int, swipes: float, like_rate: float, match_rate: float,
+                 chat_rate: float, messages: float):
+        self.n = max(users, len(PERSONAS))
+        self.rng = random.Random(seed)
+        self.swipes = swipes
+        self.like_rate = like_rate
+        self.match_rate = match_rate
+        self.chat_rate = chat_rate
+        self.messages = messages
+        self.start = END_DATE - datetime.timedelta(days=HISTORY_DAYS)
+        self.city_of = bytearray(self.n + 1)
+        self.next_match_id = 1
+        self._city_cum = list(accumulate(c[2] for c in CITIES))
+        self._archetype_cum = list(accumulate(a[0] for a in ARCHETYPES))
+
+    def _timestamp(self) -> datetime.datetime:
+        return self.start + datetime.timedelta(seconds=self.rng.random() * HISTORY_DAYS * 86400)
+
+    # --- Users ---
+
+    def persona_rows(self):
+        for p in PERSONAS:
+            self.city_of[p["id"]] = 0 # New York
+            yield (p["id"], f"user{p['id']}", p["name"], p["role"], p["bio"], p["stack"], p["image"],
+                   p["location_lat"], p["location_lng"], f"user{p['id']}@test.com", "password")
+
+    def user_rows(self):
+        rng = self.rng
+        for user_id in range(len(PERSONAS) + 1, self.n + 1):
+            city = rng.choices(range(len(CITIES)), cum_weights=self._city_cum)[0]
+            lat, lng, _, spread = CITIES[city]
+            self.city_of[user_id] = city
+            _, roles, tags = ARCHETYPES[rng.choices(range(len(ARCHETYPES)), cum_weights=self._archetype_cum)[0]]
+            stack = _weighted_sample(rng, tags, rng.randint(3, 5))
+            if rng.random() < 0.4:
+                extra = _weighted_sample(rng, COMMON_TAGS, 1)[0]
+                if extra not in stack:
+                    stack.append(extra)
+            yield (
+                user_id, f"user{user_id}",
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.choice(roles),
+                rng.choice(BIOS).format(tag=stack[0]), stack,
+                f"https://images.unsplash.com/photo-{rng.choice(PHOTOS)}?auto=format&fit=crop&w=500&q=80",
+                round(rng.gauss(lat, spread), 5), round(rng.gauss(lng, spread), 5),
+                f"user{user_id}@test.com", "password",
+            )
+
+    # --- Swipe graph ---
+
+    def build_popularity(self):
+        # Zipf weights over a shuffled ranking, globally and per city
+        ranking = list(range(1, self.n + 1))
+        self.rng.shuffle(ranking)
+        weight = {user_id: 1.0 / (rank + 1) ** ZIPF_S for rank, user_id in enumerate(ranking)}
+        self.everyone = list(range(1, self.n + 1))
+        self.everyone_cum = list(accumulate(weight[u] for u in self.everyone))
+        members = [[] for _ in CITIES]
+        for user_id in self.everyone:
+            members[self.city_of[user_id]].append(user_id)
+        self.city_members = members
+        self.city_cum = [list(accumulate(weight[u] for u in m)) for m in members]
+
+    def _targets(self, user_id: int, k: int):
+        rng = self.rng
+        city = self.city_of[user_id]
+        local = int(k * 3 * LOCAL_SWIPES) + 2
+        candidates = []
+        if self.city_members[city]:
+            candidates += rng.choices(self.city_members[city], cum_weights=self.city_cum[city], k=local)
+        candidates += rng.choices(self.everyone, cum_weights=self.everyone_cum, k=int(k * 3) + 2 - local)
+        rng.shuffle(candidates)
+        seen = set()
+        for target_id in candidates:
+            if target_id == user_id or target_id in seen or _pair_owner(user_id, target_id) != user_id:
+                continue
+            seen.add(target_id)
+            yield target_id
+            if len(seen) >= k:
+                break
+
+    def swipes_for(self, user_ids):
+        """(actions, matches) rows for the pairs these users decide."""
+        rng = self.rng
+        actions, matches = [], []
+        for user_id in user_ids:
+            # Pareto(2) has mean 2: most users swipe a little, a few swipe a lot
+            k = min(MAX_SWIPES, self.n - 1, int(self.swipes * 0.5 * rng.paretovariate(2.0)))
+            for target_id in self._targets(user_id, k):
+                swiped_at = self._timestamp()
+                if rng.random() >= self.like_rate:
+                    actions.append((user_id, target_id, "pass", swiped_at))
+                    continue
+                actions.append((user_id, target_id, "like", swiped_at))
+                if rng.random() < self.match_rate:
+                    liked_back = swiped_at + datetime.timedelta(minutes=rng.expovariate(1 / 600))
+                    actions.append((target_id, user_id, "like", liked_back))
+                    user1_id, user2_id = models.canonical_pair(user_id, target_id)
+                    matches.append((self.next_match_id, user1_id, user2_id, liked_back))
+                    self.next_match_id += 1
+        return actions, matches
+
+    # --- Conversations ---
+
+    def conversations(self, matches):
+        """(messages, unread_counters) rows for a batch of matches."""
+        rng = self.rng
+        messages, counters = [], []
+        for match_id, user1_id, user2_id, matched_at in matches:
+            if rng.random() >= self.chat_rate:
+                continue
+            count = min(500, max(1, int(self.messages * 0.2 * rng.paretovariate(1.25))))
+            sender = rng.choice((user1_id, user2_id))
+            sent_at = matched_at
+            senders = []
+            for _ in range(count):
+                if rng.random() < 0.6: # Replies alternate, with the odd double text
+                    sender = user2_id if sender == user1_id else user1_id
+                sent_at += datetime.timedelta(seconds=rng.expovariate(1 / 900))
+                senders.append(sender)
+                messages.append([match_id, sender, rng.choice(MESSAGES), sent_at, True])
+            # The tail the other side hasn't opened yet
+            tail = 0
+            while tail < len(senders) and senders[-1 - tail] == senders[-1]:
+                tail += 1
+            unread = min(tail, rng.choice((0, 0, 1, 2, 3)))
+            for row in messages[len(messages) - unread:]:
+                row[4] = False
+            if unread:
+                recipient = user2_id if senders[-1] == user1_id else user1_id
+                counters.append((recipient, match_id, unread))
+        return [tuple(m) for m in messages], counters
+
+
+# --- Loading ---
+
+USER_COLUMNS = ("id", "username", "name", "role", "bio", "stack", "image", "location_lat", "location_lng",
+                "email", "password")
+ACTION_COLUMNS = ("user_id", "target_id", "action_type", "timestamp")
+MATCH_COLUMNS = ("id", "user1_id", "user2_id", "timestamp")
+MESSAGE_COLUMNS = ("match_id", "sender_id", "content", "timestamp", "is_read")
+COUNTER_COLUMNS = ("user_id", "match_id", "count")
+
+TABLES = [models.User.__table__, models.Action.__table__, models.Match.__table__,
+          models.Message.__table__, models.UnreadCounter.__table__]
+
+
+class Loader:
+    """Batched inserts: COPY on psycopg2, raw executemany on SQLite, Core elsewhere."""
+
+    def __init__(self, conn, batch: int):
+        self.conn = conn
+        self.batch = batch
+        self.copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+        self.raw = conn.dialect.name == "sqlite"
+        self.counts = {}
+
+    def insert(self, table, columns, rows):
+        rows = list(rows)
+        for i in range(0, len(rows), self.batch):
+            chunk = rows[i:i + self.batch]
+            if self.copy:
+                self._copy(table, columns, chunk)
+            elif self.raw:
+                self._executemany(table, columns, chunk)
+            else:
+                self.conn.execute(table.insert(), [dict(zip(columns, row)) for row in chunk])
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def _executemany(self, table, columns, rows):
+        # Skips Core's per-row parameter handling; the column types' own bind
+        # processors still do the JSON/DateTime conversion
+        dialect = self.conn.dialect
+        processors = [table.c[c].type.dialect_impl(dialect).bind_processor(dialect) for c in columns]
+        if any(processors):
+            rows = [tuple(v if p is None or v is None else p(v) for p, v in zip(processors, row)) for row in rows]
+        sql = f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        self.conn.exec_driver_sql(sql, rows)
+
+    def _copy(self, table, columns, rows):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow([json.dumps(v) if isinstance(v, list) else v for v in row])
+        buf.seek(0)
+        cursor = self.conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+        finally:
+            cursor.close()
+
+
+def seed(users: int = 1000, seed: int = 42, swipes: float = 20, like_rate: float = 0.35, match_rate: float = 0.15,
+         chat_rate: float = 0.6, messages: float = 12, batch: int = 10000):
+    started = time.perf_counter()
+    gen = Generator(users, seed, swipes, like_rate, match_rate, chat_rate, messages)
+
+    # Re-create tables
+    models.Base.metadata.drop_all(bind=engine)
+    migrations.upgrade(engine)
+
+    with engine.connect() as conn:
+        if conn.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous=OFF") # Throwaway data: skip the fsyncs
+        # Maintaining every index row by row is the slow part of a bulk load
+        for table in TABLES:
+            for index in table.indexes:
+                index.drop(conn)
+        conn.commit()
+
+        loader = Loader(conn, batch)
+        loader.insert(models.User.__table__, USER_COLUMNS, gen.persona_rows())
+        # Matches to test chat: Sarah (1) and Jordan (3) like each other
+        loader.insert(models.Action.__table__, ACTION_COLUMNS, [
+            (1, 3, "like", datetime.datetime(2025, 1, 1, 12, 0, tzinfo=UTC)),
+            (3, 1, "like", datetime.datetime(2025, 1, 1, 12, 5, tzinfo=UTC)),
+        ])
+        loader.insert(models.Match.__table__, MATCH_COLUMNS, [(1, 1, 3, datetime.datetime(2025, 1, 1, 12, 5, tzinfo=UTC))])
+        gen.next_match_id = 2
+
+        rows = []
+        for row in gen.user_rows():
+            rows.append(row)
+            if len(rows) >= batch:
+                loader.insert(models.User.__table__, USER_COLUMNS, rows)
+                conn.commit()
+                rows = []
+        loader.insert(models.User.__table__, USER_COLUMNS, rows)
+        conn.commit()
+        print(f"Seed: {gen.n} users in {time.perf_counter() - started:.1f}s")
+
+        gen.build_popularity()
+        swipers = range(len(PERSONAS) + 1, gen.n + 1)
+        step = max(1, batch // max(1, int(swipes)))
+        for i in range(0, len(swipers), step):
+            actions, matches = gen.swipes_for(swipers[i:i + step])
+            messages, counters = gen.conversations(matches)
+            loader.insert(models.Action.__table__, ACTION_COLUMNS, actions)
+            loader.insert(models.Match.__table__, MATCH_COLUMNS, matches)
+            loader.insert(models.Message.__table__, MESSAGE_COLUMNS, messages)
+            loader.insert(models.UnreadCounter.__table__, COUNTER_COLUMNS, counters)
+            conn.commit()
+        print(f"Seed: swipes, matches and messages in {time.perf_counter() - started:.1f}s")
+
+        for table in TABLES:
+            for index in table.indexes:
+                index.create(conn)
+        if conn.dialect.name == "postgresql":
+            # Explicit ids don't advance the sequences
+            for table in ("users", "matches"):
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                  f"COALESCE((SELECT MAX(id) FROM {table}), 1))"))
+        conn.commit()
+
+    elapsed = time.perf_counter() - started
+    counts = ", ".join(f"{name}={count}" for name, count in loader.counts.items())
+    print(f"Seed: done in {elapsed:.1f}s ({sum(loader.counts.values()) / elapsed:,.0f} rows/s): {counts}")
+    return loader.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-create the database and fill it with synthetic data.")
+    parser.add_argument("--users", type=int, default=1000, help="total users, personas included (default 1000)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed; the same seed gives the same data")
+    parser.add_argument("--swipes", type=float, default=20, help="average swipes per user (power-law)")
+    parser.add_argument("--like-rate", type=float, default=0.35, help="share of swipes that are likes")
+    parser.add_argument("--match-rate", type=float, default=0.15, help="share of likes that are returned")
+    parser.add_argument("--chat-rate", type=float, default=0.6, help="share of matches with messages")
+    parser.add_argument("--messages", type=float, default=12, help="average messages per conversation (power-law)")
+    parser.add_argument("--batch", type=int, default=10000, help="rows per insert batch")
+    args = parser.parse_args()
+    seed(args.users, args.seed, args.swipes, args.like_rate, args.match_rate, args.chat_rate, args.messages, args.batch)
+    print("Database re-seeded with rich stacks.")
+
+
+if __name__ == "__main__":
+    main()
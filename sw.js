@@ -1,4 +1,7 @@
 const CACHE_NAME = 'commit-pwa-v1';
+const ASSET_CACHE = 'commit-assets-v1';
+// Content-hashed names (e.g. /static/uploads/<sha256>_thumb.webp) never change
+const HASHED_ASSET = /(^|[._-])[0-9a-f]{16,}[._-]/;
 const ASSETS = [
     '/',
     '/index.html',
@@ -31,6 +34,19 @@ self.addEventListener('fetch', (e) => {
         return;
     }
 
+    // Versioned assets: Cache first, the network only on a miss
+    if (e.request.method === 'GET' && HASHED_ASSET.test(url.pathname.split('/').pop())) {
+        e.respondWith(
+            caches.open(ASSET_CACHE).then((cache) => cache.match(e.request).then((cached) => {
+                return cached || fetch(e.request).then((response) => {
+                    if (response.ok) cache.put(e.request, response.clone());
+                    return response;
+                });
+            }))
+        );
+        return;
+    }
+
     e.respondWith(
         fetch(e.request).catch(() => {
             return caches.match(e.request);
@@ -0,0 +1,206 @@
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import exists, literal, or_, select, text
+from sqlalchemy.orm import Session
+
+import metrics
+import models
+from database import dialect_insert, engine
+
+# Write-behind for passes: buffered in memory and flushed with one executemany
+# upsert every SWIPE_FLUSH_MS or SWIPE_FLUSH_ROWS, whichever comes first.
+# Buffered passes live in this process only, so a crash loses at most one
+# flush interval of passes and other workers see them only after the flush.
+SWIPE_WRITE_BEHIND = os.getenv("SWIPE_WRITE_BEHIND", "0") == "1"
+SWIPE_FLUSH_MS = int(os.getenv("SWIPE_FLUSH_MS", "200"))
+SWIPE_FLUSH_ROWS = int(os.getenv("SWIPE_FLUSH_ROWS", "500"))
+
+
+def _lock_pair(db: Session, user_a: int, user_b: int):
+    # Postgres (READ COMMITTED): two simultaneous mutual likes would each miss
+    # the other's uncommitted like and create no match. A transaction-scoped
+    # advisory lock on the canonical pair serializes them; the second one sees
+    # the first's like once it commits. SQLite already serializes writers.
+    if db.get_bind().dialect.name == "postgresql":
+        user1_id, user2_id = models.canonical_pair(user_a, user_b)
+        db.execute(text("SELECT pg_advisory_xact_lock(:a, :b)"), {"a": user1_id, "b": user2_id})
+
+
+def record_action(db: Session, user_id: int, target_id: int, action_type: str) -> Tuple[bool, Optional[int]]:
+    """Store a swipe and create the match it completes, in one transaction.
+
+    Returns (is_match, new_match_id); new_match_id is None unless this swipe
+    created the match.
+    """
+    insert = dialect_insert(db.get_bind())
+    actions, matches = models.Action.__table__, models.Match.__table__
+    now = models.utcnow()
+
+    _lock_pair(db, user_id, target_id)
+
+    # One row per (user, target): re-swiping overwrites the earlier decision
+    db.execute(
+        insert(actions).values(user_id=user_id, target_id=target_id, action_type=action_type, timestamp=now)
+        .on_conflict_do_update(
+            index_elements=[actions.c.user_id, actions.c.target_id],
+            set_={"action_type": action_type, "timestamp": now}
+        )
+    )
+
+    is_match, new_match_id = False, None
+    # A buffered pass from the target supersedes any like of theirs still in the table
+    if action_type == "like" and not pass_buffer.has_pending(target_id, user_id):
+        # Insert the canonical pair only if the reverse like exists. DO NOTHING
+        # returns a row only when this statement inserted it, which is what
+        # marks the match as new; otherwise look up the existing one.
+        user1_id, user2_id = models.canonical_pair(user_id, target_id)
+        reverse_like = exists().where(
+            actions.c.user_id == target_id,
+            actions.c.target_id == user_id,
+            actions.c.action_type == "like"
+        )
+        new_match_id = db.execute(
+            insert(matches).from_select(
+                ["user1_id", "user2_id", "timestamp"],
+                select(literal(user1_id), literal(user2_id), literal(now, matches.c.timestamp.type)).where(reverse_like)
+            ).on_conflict_do_nothing(
+                index_elements=[matches.c.user1_id, matches.c.user2_id]
+            ).returning(matches.c.id)
+        ).scalar()
+        if new_match_id is not None:
+            is_match = True
+        else:
+            is_match = db.execute(
+                select(matches.c.id).where(matches.c.user1_id == user1_id, matches.c.user2_id == user2_id, reverse_like)
+            ).first() is not None
+
+    db.commit()
+    return is_match, new_match_id
+
+
+def new_match_event(match_id: int, partner_id: int) -> dict:
+    return {
+        "type": "new_match",
+        "match_id": match_id,
+        "user_id": partner_id,
+        "timestamp": models.isoformat_utc(models.utcnow())
+    }
+
+
+class PassBuffer:
+    """Pending `pass` actions awaiting a bulk flush, with a per-user overlay.
+
+    Reads that exclude already-acted targets union in `pending_targets`, so a
+    user never sees a profile they passed on just because it isn't flushed yet.
+    """
+
+    def __init__(self, enabled: bool = SWIPE_WRITE_BEHIND):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pending: Dict[Tuple[int, int], object] = {} # (user_id, target_id) -> timestamp
+        self._inflight: Dict[Tuple[int, int], object] = {}
+        self._by_user: Dict[int, Set[int]] = defaultdict(set)
+        self.flushes = 0
+        self.rows_flushed = 0
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="pass-buffer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write out whatever is still buffered."""
+        if self._thread is not None:
+            self._stopped.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def add(self, user_id: int, target_id: int):
+        with self._lock:
+            self._pending[(user_id, target_id)] = models.utcnow()
+            self._by_user[user_id].add(target_id)
+            full = len(self._pending) >= SWIPE_FLUSH_ROWS
+        if full:
+            self._wake.set()
+
+    def discard(self, user_id: int, target_id: int):
+        """Drop a buffered pass superseded by a synchronous action on the same pair."""
+        with self._lock:
+            if self._pending.pop((user_id, target_id), None) is not None:
+                self._forget(user_id, target_id)
+
+    def has_pending(self, user_id: int, target_id: int) -> bool:
+        with self._lock:
+            return (user_id, target_id) in self._pending or (user_id, target_id) in self._inflight
+
+    def pending_targets(self, user_id: int) -> Set[int]:
+        with self._lock:
+            return set(self._by_user.get(user_id, ()))
+
+    def _forget(self, user_id: int, target_id: int):
+        if (user_id, target_id) in self._pending or (user_id, target_id) in self._inflight:
+            return
+        targets = self._by_user.get(user_id)
+        if targets is not None:
+            targets.discard(target_id)
+            if not targets:
+                del self._by_user[user_id]
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                self._inflight, self._pending = self._pending, {}
+                rows = [{"user_id": u, "target_id": t, "action_type": "pass", "timestamp": ts}
+                        for (u, t), ts in self._inflight.items()]
+            try:
+                actions = models.Action.__table__
+                stmt = dialect_insert(engine)(actions)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[actions.c.user_id, actions.c.target_id],
+                    set_={"action_type": stmt.excluded.action_type, "timestamp": stmt.excluded.timestamp},
+                    # A newer synchronous like on the same pair wins over a late flush;
+                    # rows without a timestamp (legacy data) are always overwritten
+                    where=or_(actions.c.timestamp.is_(None), actions.c.timestamp < stmt.excluded.timestamp)
+                )
+                with engine.begin() as conn:
+                    conn.execute(stmt, rows)
+            except Exception as e:
+                print(f"Swipes: flush of {len(rows)} passes failed, will retry: {e}")
+                with self._lock:
+                    for key, ts in self._inflight.items():
+                        self._pending.setdefault(key, ts)
+                    self._inflight = {}
+                return
+            with self._lock:
+                done, self._inflight = self._inflight, {}
+                for user_id, target_id in done:
+                    self._forget(user_id, target_id)
+                self.flushes += 1
+                self.rows_flushed += len(rows)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(SWIPE_FLUSH_MS / 1000)
+            self._wake.clear()
+            self.flush()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "pending": len(self._pending) + len(self._inflight),
+                    "flushes": self.flushes, "rows_flushed": self.rows_flushed}
+
+
+pass_buffer = PassBuffer()
+metrics.register("pass_buffer", pass_buffer.snapshot)
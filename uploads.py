@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError: # Optional: without Pillow uploads are stored but not resized
+    Image = None
+
+UPLOAD_DIR = "static/uploads"
+UPLOAD_URL = "/static/uploads"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+CHUNK_SIZE = 1024 * 1024
+# Whole multipart request: the image plus room for boundaries and part headers
+MAX_UPLOAD_REQUEST_BYTES = MAX_UPLOAD_BYTES + 64 * 1024
+UPLOAD_PATHS = ("/api/upload",)
+
+# Resized variants (longest side, px), generated in the background
+VARIANTS = {"thumb": 160, "card": 800}
+VARIANT_FORMAT = "webp" if Image is not None and features.check("webp") else "jpeg"
+VARIANT_EXT = "webp" if VARIANT_FORMAT == "webp" else "jpg"
+
+# Magic bytes -> extension; anything else is rejected
+SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+def _sniff(head: bytes) -> Optional[str]:
+    for magic, ext in SIGNATURES:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+async def store_upload(file: UploadFile) -> str:
+    """Stream an upload to disk under its SHA-256; returns the stored file name.
+
+    Identical images map to the same name, so re-uploads are deduplicated.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    part_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    ext = None
+    try:
+        with open(part_path, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if ext is None:
+                    ext = _sniff(chunk)
+                    if ext is None:
+                        raise HTTPException(status_code=415, detail="Unsupported image type")
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Image too large")
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+        if ext is None:
+            raise HTTPException(status_code=400, detail="Empty upload")
+
+        name = f"{digest.hexdigest()}.{ext}"
+        path = os.path.join(UPLOAD_DIR, name)
+        if os.path.exists(path):
+            os.remove(part_path) # Already stored
+        else:
+            os.replace(part_path, path)
+        return name
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+
+class UploadLimitMiddleware:
+    """413 for upload requests over `max_bytes`, before the multipart parser spools them.
+
+    `store_upload` only sees the file once Starlette has written the whole
+    body to a temp file, so the cap is enforced here: up front on
+    Content-Length, and while the body is received for chunked requests.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int = MAX_UPLOAD_REQUEST_BYTES, paths=UPLOAD_PATHS):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await JSONResponse({"detail": "Image too large"}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing, which FastAPI lets through as-is
+                    raise HTTPException(status_code=413, detail="Image too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def variant_name(name: str, variant: str) -> str:
+    return f"{os.path.splitext(name)[0]}_{variant}.{VARIANT_EXT}"
+
+
+def variant_url(image: Optional[str], variant: str) -> Optional[str]:
+    """URL of a resized variant of an uploaded image, falling back to the image itself."""
+    if not image or not image.startswith(UPLOAD_URL + "/"):
+        return image # External URLs are served as-is
+    name = variant_name(image[len(UPLOAD_URL) + 1:], variant)
+    if os.path.exists(os.path.join(UPLOAD_DIR, name)):
+        return f"{UPLOAD_URL}/{name}"
+    return image # Not generated (yet)
+
+
+def make_variants(name: str):
+    """Write the resized variants of an upload; runs in the process pool."""
+    src = os.path.join(UPLOAD_DIR, name)
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img) # Phone photos carry their rotation in EXIF
+        img = img.convert("RGBA" if VARIANT_FORMAT == "webp" else "RGB")
+        for variant, size in VARIANTS.items():
+            dest = os.path.join(UPLOAD_DIR, variant_name(name, variant))
+            if os.path.exists(dest):
+                continue
+            resized = img.copy()
+            resized.thumbnail((size, size))
+            part = f"{dest}.{os.getpid()}.part"
+            resized.save(part, format=VARIANT_FORMAT, quality=80)
+            os.replace(part, dest)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+async def generate_variants(name: str):
+    global _pool
+    if Image is None:
+        return
+    if _pool is None:
+        # spawn: don't fork a process that already runs threads (DB pools, flushers)
+        _pool = ProcessPoolExecutor(max_workers=UPLOAD_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        await asyncio.get_running_loop().run_in_executor(_pool, make_variants, name)
+    except Exception as e:
+        print(f"Uploads: variants for {name} failed: {e}")
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import tempfile
+
+from broker import SQLiteBroker
+
+# Two brokers on one SQLite file stand in for two uvicorn workers: an event
+# published by "worker A" must reach the handlers subscribed in "worker B".
+
+async def run_test():
+    path = os.path.join(tempfile.mkdtemp(), "ws_broker.db")
+    worker_a = SQLiteBroker(path, poll_interval=0.01)
+    worker_b = SQLiteBroker(path, poll_interval=0.01)
+
+    received = {"a": [], "b": []}
+
+    async def on_a(payload):
+        received["a"].append(payload)
+
+    async def on_b(payload):
+        received["b"].append(payload)
+
+    worker_a.subscribe("ws", on_a)
+    worker_b.subscribe("ws", on_b)
+    await worker_a.start()
+    await worker_b.start()
+
+    print("--- Publishing 100 events from worker A ---")
+    for i in range(100):
+        await worker_a.publish("ws", {"user_id": 4, "message": {"type": "new_message", "text": f"msg {i}"}})
+
+    for _ in range(100):
+        if len(received["a"]) == 100 and len(received["b"]) == 100:
+            break
+        await asyncio.sleep(0.02)
+
+    await worker_a.stop()
+    await worker_b.stop()
+
+    for name in ("a", "b"):
+        texts = [p["message"]["text"] for p in received[name]]
+        if texts == [f"msg {i}" for i in range(100)]:
+            print(f"   [Worker {name.upper()}] SUCCESS: received all 100 events in order.")
+        else:
+            print(f"   [Worker {name.upper()}] FAILURE: received {len(texts)} events.")
+
+if __name__ == "__main__":
+    asyncio.run(run_test())
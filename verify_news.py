@@ -0,0 +1,117 @@
+import asyncio
+import email.utils
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import scraper
+from scraper import NewsService, NewsStore, parse_headlines
+
+# A local HTTP server stands in for news.ycombinator.com, serving a saved
+# front page with ETag/Last-Modified validators, so nothing here needs network.
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "hn_frontpage.html")
+
+class StandIn(BaseHTTPRequestHandler):
+    page = open(FIXTURE, "rb").read()
+    last_modified = email.utils.formatdate(time.time(), usegmt=True)
+    delay = 0.0
+    requests = []
+
+    def do_GET(self):
+        etag = '"' + hashlib.sha256(self.page).hexdigest()[:16] + '"'
+        StandIn.requests.append(dict(self.headers))
+        time.sleep(StandIn.delay)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.page)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", StandIn.last_modified)
+        self.end_headers()
+        self.wfile.write(self.page)
+
+    def log_message(self, *args):
+        pass
+
+def check(label, ok):
+    print(f"   [{label}] {'SUCCESS' if ok else 'FAILURE'}")
+
+async def run_test(url):
+    html = open(FIXTURE, encoding="utf-8").read()
+
+    print("--- Parsing the saved front page ---")
+    expected = parse_headlines(html, url)
+    for h in expected:
+        print(f"   {h['title']} -> {h['url']}")
+    check("5 AI headlines", len(expected) == 5)
+    check("relative links resolved", any(h["url"] == url + "item?id=41000003" for h in expected))
+    fast = scraper.LexborHTMLParser
+    scraper.LexborHTMLParser = None # Force the BeautifulSoup path
+    check(f"BeautifulSoup ({scraper.BS4_PARSER}) agrees with the fast path", parse_headlines(html, url) == expected)
+    scraper.LexborHTMLParser = fast
+
+    store = NewsStore(os.path.join(tempfile.mkdtemp(), "news.db"))
+    service = NewsService(url, store, ttl=0.5, min_interval=0.2)
+
+    print("--- First refresh: full fetch ---")
+    await service.refresh()
+    check("headlines cached", service.headlines == expected and service.fetches == 1)
+
+    print("--- Refresh after the TTL: conditional request, 304 ---")
+    await asyncio.sleep(0.6)
+    await service.refresh()
+    sent = StandIn.requests[-1]
+    check("If-None-Match and If-Modified-Since sent", "If-None-Match" in sent and "If-Modified-Since" in sent)
+    check("304 kept the cached headlines", service.not_modified == 1 and service.headlines == expected)
+
+    print("--- Rate limit: 20 concurrent refreshes of a stale cache ---")
+    await asyncio.sleep(0.6)
+    before = len(StandIn.requests)
+    await asyncio.gather(*(service.refresh() for _ in range(20)))
+    check(f"one upstream request ({len(StandIn.requests) - before})", len(StandIn.requests) - before == 1)
+    await asyncio.gather(*(service.refresh(force=False) for _ in range(5)))
+    check("fresh cache: no further requests", len(StandIn.requests) - before == 1)
+
+    print("--- Slow upstream: snapshot must not wait for it ---")
+    await asyncio.sleep(0.6)
+    StandIn.delay = 1.0
+    start = time.perf_counter()
+    snapshot = await service.snapshot()
+    elapsed = (time.perf_counter() - start) * 1000
+    check(f"served stale cache in {elapsed:.1f} ms", elapsed < 100 and snapshot["stale"] and snapshot["headlines"] == expected)
+    await asyncio.sleep(1.3)
+    check("background refresh completed", not (await service.snapshot())["stale"])
+    StandIn.delay = 0.0
+    await service.stop()
+
+    print("--- Restart: headlines come back from news.db ---")
+    before = len(StandIn.requests)
+    restarted = NewsService(url, store, ttl=60, min_interval=0.2)
+    snapshot = await restarted.snapshot()
+    check("loaded without an upstream request", snapshot["headlines"] == expected and len(StandIn.requests) == before)
+    await restarted.stop()
+
+    print("--- Broken news.db: refreshes keep going ---")
+    broken = NewsService(url, NewsStore(os.path.join(tempfile.mkdtemp(), "missing", "news.db")), ttl=0.3, min_interval=0.1)
+    await broken.start()
+    await asyncio.sleep(1.0)
+    alive = not broken._task.done()
+    check(f"refresher alive after {broken.failures} storage failures", alive and broken.fetches + broken.not_modified >= 2)
+    check("headlines still served from memory", (await broken.snapshot())["headlines"] == expected)
+    await broken.stop()
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        asyncio.run(run_test(f"http://127.0.0.1:{server.server_port}/"))
+    finally:
+        server.shutdown()